@@ -0,0 +1,6 @@
+# benchmarks package
+#
+# Seeded synthetic graphs and timings of the hot paths. Run from the
+# dijkstra_interface directory:
+#   python -m benchmarks --size medium --output results.json
+#   python -m benchmarks --size medium --compare results.json
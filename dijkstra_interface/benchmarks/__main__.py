@@ -0,0 +1,71 @@
+# __main__.py
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+from .generators import GENERATORS
+from .suite import GROUPS, SIZES, compare, run_suite
+
+
+def _milliseconds(seconds):
+    return '-' if seconds is None else f'{seconds * 1000:.2f}'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description="Time the hot paths on seeded synthetic graphs.")
+    parser.add_argument('--size', choices=SIZES, default='small')
+    parser.add_argument('--nodes', type=int, help="override the node count of the sparse graphs")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--kind', action='append', choices=GENERATORS, help="graph kind to run, may be repeated")
+    parser.add_argument('--group', action='append', choices=GROUPS, help="benchmark group to run, may be repeated")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    parser.add_argument('--compare', metavar='BASELINE', help="compare against results saved with --output")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="slowdown allowed before a case counts as a regression (default 0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    def report(key, timing):
+        print(f'{key:<40} {_milliseconds(timing["min"]):>12} ms  (median {_milliseconds(timing["median"])})')
+
+    document = run_suite(args.size, args.seed, args.repeat, args.kind, args.group, args.nodes, report)
+    document['meta'].update({
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    })
+    for key, reason in document['skipped'].items():
+        print(f'{key:<40} skipped: {reason}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
+
+    if baseline is None:
+        return 0
+    for name in ('size', 'seed', 'config'):
+        if baseline['meta'].get(name) != document['meta'][name]:
+            print(f"warning: baseline was run with a different {name}", file=sys.stderr)
+    rows = compare(document, baseline, args.tolerance)
+    print()
+    print(f'{"case":<40} {"baseline ms":>12} {"current ms":>12} {"ratio":>7}  status')
+    for key, before, after, ratio, status in rows:
+        ratio_text = '-' if ratio is None else f'{ratio:.2f}'
+        print(f'{key:<40} {_milliseconds(before):>12} {_milliseconds(after):>12} {ratio_text:>7}  {status}')
+    regressions = [row for row in rows if row[4] == 'slower']
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than the baseline by more than {args.tolerance:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+# generators.py
+
+import math
+import random
+
+from graph import CompactEdge, CompactNode, Edge, Graph, Node
+
+# Every generator returns (positions, edges): positions[i] is the (x, y) of
+# node i and edges are (source index, target index, weight, directed)
+# tuples. The same kind, size and seed always give the same graph. Weights
+# are whole numbers of at least 1, so the bucket queue can run on all of them.
+
+
+def grid(nodes, seed=0):
+    # Road-like: a jittered square grid, 4 neighbours each, with weights a
+    # little above the straight line length and a few roads missing
+    rng = random.Random(seed)
+    side = max(2, math.isqrt(nodes))
+    positions = [(col * 50 + rng.uniform(-10, 10), row * 50 + rng.uniform(-10, 10))
+                 for row in range(side) for col in range(side)]
+    edges = []
+    for i in range(side * side):
+        row, col = divmod(i, side)
+        for j in (i + 1 if col + 1 < side else None, i + side if row + 1 < side else None):
+            if j is not None and rng.random() > 0.05:
+                edges.append((i, j, _length_weight(positions, i, j, rng), False))
+    return positions, edges
+
+
+def random_geometric(nodes, seed=0, degree=6):
+    # Uniform points joined to every other point within a radius chosen for
+    # about degree neighbours each
+    rng = random.Random(seed)
+    side = 50 * math.sqrt(nodes)
+    radius = math.sqrt(degree * side * side / (math.pi * nodes))
+    positions = [(rng.uniform(0, side), rng.uniform(0, side)) for _ in range(nodes)]
+    cells = {}
+    for i, (x, y) in enumerate(positions):
+        cells.setdefault((int(x // radius), int(y // radius)), []).append(i)
+    edges = []
+    for (cx, cy), members in cells.items():
+        neighbors = [j for dx in (-1, 0, 1) for dy in (-1, 0, 1) for j in cells.get((cx + dx, cy + dy), ())]
+        for i in members:
+            x, y = positions[i]
+            for j in neighbors:
+                if j > i and math.hypot(positions[j][0] - x, positions[j][1] - y) <= radius:
+                    edges.append((i, j, _length_weight(positions, i, j, rng), False))
+    return positions, edges
+
+
+def scale_free(nodes, seed=0, links=3):
+    # Barabasi-Albert preferential attachment: each new node links to links
+    # existing nodes picked in proportion to their degree
+    rng = random.Random(seed)
+    side = 50 * math.sqrt(nodes)
+    positions = [(rng.uniform(0, side), rng.uniform(0, side)) for _ in range(nodes)]
+    edges = []
+    ends = []  # Every edge endpoint, so a uniform pick is degree weighted
+    for i in range(min(links + 1, nodes)):
+        for j in range(i):
+            edges.append((j, i, rng.randint(1, 20), False))
+            ends.extend((i, j))
+    for i in range(links + 1, nodes):
+        targets = set()
+        while len(targets) < links:
+            targets.add(rng.choice(ends))
+        for j in sorted(targets):
+            edges.append((j, i, rng.randint(1, 20), False))
+            ends.extend((i, j))
+    return positions, edges
+
+
+def complete(nodes, seed=0):
+    # Dense: every pair joined, nodes on a circle
+    rng = random.Random(seed)
+    radius = 20 * nodes
+    positions = [(radius + radius * math.cos(2 * math.pi * i / nodes),
+                  radius + radius * math.sin(2 * math.pi * i / nodes)) for i in range(nodes)]
+    edges = [(i, j, rng.randint(1, 100), False) for i in range(nodes) for j in range(i + 1, nodes)]
+    return positions, edges
+
+
+def _length_weight(positions, i, j, rng):
+    (x1, y1), (x2, y2) = positions[i], positions[j]
+    return max(1, math.ceil(math.hypot(x2 - x1, y2 - y1) * rng.uniform(1.0, 1.5)))
+
+
+GENERATORS = {
+    'grid': grid,
+    'geometric': random_geometric,
+    'scale_free': scale_free,
+    'complete': complete,
+}
+
+
+def generate(kind, nodes, seed=0):
+    return GENERATORS[kind](nodes, seed)
+
+
+def build_graph(positions, edges, bulk=False):
+    # bulk=False goes through Node/Edge and Graph.add_edge like the editor;
+    # bulk=True uses the slotted classes and Graph.add_edges like the loaders
+    graph = Graph()
+    node_class, edge_class = (CompactNode, CompactEdge) if bulk else (Node, Edge)
+    nodes = [node_class(i, x, y) for i, (x, y) in enumerate(positions)]
+    for node in nodes:
+        graph.add_node(node)
+    if bulk:
+        graph.add_edges(edge_class(nodes[i], nodes[j], weight, directed) for i, j, weight, directed in edges)
+    else:
+        for i, j, weight, directed in edges:
+            graph.add_edge(edge_class(nodes[i], nodes[j], weight, directed))
+    return graph
@@ -0,0 +1,81 @@
+# speedup.py
+
+import argparse
+import json
+import os
+import random
+import sys
+
+from dijkstra import solve_frozen
+from parallel import ParallelSolver
+
+from .generators import GENERATORS, build_graph, generate
+from .suite import SIZES, measure
+
+WORKERS = (1, 2, 4, 8)
+
+
+def run_speedup(size='large', seed=0, repeat=3, kinds=None, workers=WORKERS, nodes=None, delta=None, report=None):
+    # Times one full single-source search with solve_frozen and with the
+    # parallel engine at each worker count, on the same graphs and sources
+    # as the benchmark suite. Workers are started before timing, as a
+    # long-lived ParallelSolver would be. Returns the results document;
+    # report(kind, row) is called as each graph finishes.
+    config = dict(SIZES[size])
+    if nodes:
+        config['nodes'] = nodes
+    document = {
+        'meta': {'size': size, 'seed': seed, 'repeat': repeat, 'config': config,
+                 'cpus': os.cpu_count(), 'workers': list(workers), 'delta': delta},
+        'results': {},
+    }
+    for kind in kinds or GENERATORS:
+        positions, edges = generate(kind, config['dense'] if kind == 'complete' else config['nodes'], seed)
+        frozen = build_graph(positions, edges).freeze()
+        source = random.Random(seed).randrange(len(frozen))
+        expected = solve_frozen(frozen, source)[0]
+        row = {'nodes': len(frozen), 'edges': len(frozen.targets),
+               'sequential': measure(lambda: solve_frozen(frozen, source), repeat=repeat)['min'],
+               'parallel': {}}
+        for count in workers:
+            with ParallelSolver(frozen, count) as solver:
+                if list(solver.solve(source, delta=delta)[0]) != list(expected):
+                    raise AssertionError(f"{kind}: parallel distances with {count} workers differ from solve_frozen")
+                row['parallel'][count] = measure(lambda: solver.solve(source, delta=delta), repeat=repeat)['min']
+        document['results'][kind] = row
+        if report:
+            report(kind, row)
+    return document
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.speedup',
+                                     description="Compare the parallel engine with the sequential one.")
+    parser.add_argument('--size', choices=SIZES, default='large')
+    parser.add_argument('--nodes', type=int, help="override the node count of the sparse graphs")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--kind', action='append', choices=GENERATORS, help="graph kind to run, may be repeated")
+    parser.add_argument('--workers', type=int, nargs='+', default=WORKERS)
+    parser.add_argument('--delta', type=float, help="bucket width (default: ParallelSolver.default_delta)")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    print(f"{os.cpu_count()} CPUs")
+    header = f'{"graph":<12} {"nodes":>8} {"edges":>9} {"sequential":>11}'
+    print(header + ''.join(f' {f"{count} workers":>18}' for count in args.workers))
+
+    def report(kind, row):
+        cells = ''.join(f' {seconds * 1000:>9.1f} ms {row["sequential"] / seconds:>4.2f}x'
+                        for seconds in row['parallel'].values())
+        print(f'{kind:<12} {row["nodes"]:>8} {row["edges"]:>9} {row["sequential"] * 1000:>8.1f} ms' + cells)
+
+    document = run_speedup(args.size, args.seed, args.repeat, args.kind, args.workers, args.nodes, args.delta, report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,241 @@
+# suite.py
+
+import gc
+import random
+import statistics
+import time
+
+from dijkstra import DijkstraAlgorithm, STRATEGIES, SearchWorkspace, solve, solve_frozen
+from priority_queue import QUEUES
+
+from .generators import GENERATORS, build_graph, generate
+
+# Graph sizes per preset: nodes for the sparse generators, nodes of the
+# complete graph, solver queries and hit-test points per timed run
+SIZES = {
+    'small': {'nodes': 1000, 'dense': 100, 'queries': 20, 'points': 500},
+    'medium': {'nodes': 10000, 'dense': 300, 'queries': 20, 'points': 1000},
+    'large': {'nodes': 100000, 'dense': 700, 'queries': 10, 'points': 2000},
+}
+GROUPS = ('construct', 'solve', 'queue', 'hit', 'redraw')
+
+
+def measure(run, setup=None, repeat=5):
+    # Times run() repeat times, calling setup() untimed before each run.
+    # The garbage collector is held off while timing, as timeit does.
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        gc.collect()
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - started)
+        finally:
+            if enabled:
+                gc.enable()
+    return {'min': min(times), 'median': statistics.median(times), 'mean': statistics.fmean(times),
+            'repeat': repeat}
+
+
+def run_suite(size='small', seed=0, repeat=5, kinds=None, groups=None, nodes=None, report=None):
+    # Returns the results document written by the command line: timings
+    # keyed 'group/kind/case' in seconds, sizes of the generated graphs and
+    # the cases that could not run here. report(key, timing) is called as
+    # each case finishes.
+    config = dict(SIZES[size])
+    if nodes:
+        config['nodes'] = nodes
+    groups = set(groups or GROUPS)
+    document = {
+        'meta': {'size': size, 'seed': seed, 'repeat': repeat, 'config': config},
+        'graphs': {},
+        'results': {},
+        'skipped': {},
+    }
+    view = None
+    for kind in kinds or GENERATORS:
+        positions, edges = generate(kind, config['dense'] if kind == 'complete' else config['nodes'], seed)
+        document['graphs'][kind] = {'nodes': len(positions), 'edges': len(edges)}
+        cases = []
+        if 'construct' in groups:
+            cases += _construct_cases(positions, edges)
+        graph = build_graph(positions, edges)
+        rng = random.Random(seed)
+        if 'solve' in groups or 'queue' in groups:
+            pairs = [(graph.nodes[rng.randrange(len(positions))], graph.nodes[rng.randrange(len(positions))])
+                     for _ in range(config['queries'])]
+            if 'solve' in groups:
+                cases += _solve_cases(graph, pairs)
+                cases += _frozen_cases(graph, pairs)
+            if 'queue' in groups:
+                cases += _queue_cases(graph, pairs)
+        if 'hit' in groups:
+            cases += _hit_cases(positions, edges, graph, rng, config['points'])
+        if 'redraw' in groups:
+            if view is None:
+                view = _redraw_view()
+            if isinstance(view, str):
+                document['skipped'][f'redraw/{kind}'] = view
+            else:
+                cases += _redraw_cases(view, positions, edges)
+
+        for name, run, setup in cases:
+            key = f'{name.split("/")[0]}/{kind}/{name.split("/")[1]}'
+            document['results'][key] = measure(run, setup, repeat)
+            if report:
+                report(key, document['results'][key])
+    if view is not None and not isinstance(view, str):
+        view.root.destroy()
+    return document
+
+
+def _construct_cases(positions, edges):
+    return [
+        ('construct/add_edge', lambda: build_graph(positions, edges), None),
+        ('construct/add_edges', lambda: build_graph(positions, edges, bulk=True), None),
+    ]
+
+
+def _solve_cases(graph, pairs):
+    # The DijkstraAlgorithm entry point the headless callers use
+    def case(strategy):
+        def run():
+            for source, target in pairs:
+                DijkstraAlgorithm(graph, strategy=strategy).run(source, target)
+        return f'solve/{strategy}', run, None
+    return [case(strategy) for strategy in STRATEGIES]
+
+
+def _frozen_cases(graph, pairs):
+    # Index based search allocating its arrays per query, and reusing a
+    # SearchWorkspace across queries
+    frozen = graph.freeze()
+    index_pairs = [(frozen.index_of[source.id], frozen.index_of[target.id]) for source, target in pairs]
+    workspace = SearchWorkspace(len(frozen))
+    return [
+        ('solve/frozen', lambda: [solve_frozen(frozen, s, t) for s, t in index_pairs], None),
+        ('solve/frozen_workspace', lambda: [solve_frozen(frozen, s, t, workspace=workspace)
+                                            for s, t in index_pairs], None),
+    ]
+
+
+def _queue_cases(graph, pairs):
+    # The plain search loop against each priority_queue implementation
+    def case(queue):
+        def run():
+            for source, target in pairs:
+                solve(graph, source, target, queue=queue)
+        return f'queue/{queue}', run, None
+    return [('queue/inline', lambda: [solve(graph, s, t) for s, t in pairs], None)] + [case(q) for q in QUEUES]
+
+
+def _hit_cases(positions, edges, graph, rng, count):
+    xs = [x for x, _ in positions]
+    ys = [y for _, y in positions]
+    points = [(rng.uniform(min(xs), max(xs)), rng.uniform(min(ys), max(ys))) for _ in range(count)]
+    fresh = []
+
+    def new_graph():
+        fresh[:] = [build_graph(positions, edges, bulk=True)]
+
+    def build_index():
+        fresh[0].node_index, fresh[0].edge_index
+
+    graph.node_index, graph.edge_index  # Built before timing the lookups
+    return [
+        ('hit/index', build_index, new_graph),
+        ('hit/get_node_at', lambda: [graph.get_node_at(x, y) for x, y in points], None),
+        ('hit/get_edge_at', lambda: [graph.get_edge_at(x, y) for x, y in points], None),
+    ]
+
+
+def _redraw_view():
+    # A real visualizer on a withdrawn Tk window, or the reason there
+    # can't be one here (no display, no Tk, no Pillow)
+    try:
+        import tkinter
+        from gui import DijkstraVisualizer
+    except ImportError as error:
+        return f"cannot import the GUI: {error}"
+    try:
+        root = tkinter.Tk()
+    except tkinter.TclError as error:
+        return f"no display: {error}"
+    root.withdraw()
+    return DijkstraVisualizer(root)
+
+
+def _redraw_cases(view, positions, edges):
+    graph = build_graph(positions, edges, bulk=True)
+    distances, previous, _ = solve(graph, graph.nodes[0])
+    visited = set(distances)
+
+    def settle():
+        view.renderer.flush()
+        view.root.update_idletasks()
+
+    def draw():
+        # Everything a graph load does on screen
+        view.reset_graph()
+        view.graph = graph
+        for node in graph.nodes.values():
+            view.draw_node(node)
+        for edge in graph.drawn_edges():
+            view.draw_edge(edge)
+        view.fit_view()
+        view.refresh_view()
+        settle()
+
+    def clear():
+        view.clear_response()
+        settle()
+
+    def restore():
+        view.restore_state(distances, previous, visited, None, None)
+        settle()
+
+    direction = [1]
+
+    def pan():
+        # Half a view sideways, back and forth so the view stays on the graph
+        renderer = view.renderer
+        width, _ = view.canvas_size()
+        shift = direction[0] * width / 2 / renderer.scale
+        direction[0] = -direction[0]
+        renderer.set_view(renderer.scale, renderer.origin_x + shift, renderer.origin_y)
+        view.refresh_view()
+        settle()
+
+    return [
+        ('redraw/draw', draw, None),
+        ('redraw/restore_state', restore, clear),
+        ('redraw/pan', pan, None),
+    ]
+
+
+def compare(document, baseline, tolerance=0.25):
+    # Rows of (key, baseline seconds, current seconds, ratio, status) using
+    # the fastest run of each case. status is 'slower' or 'faster' past the
+    # tolerance, 'ok' in between, 'new' or 'missing' when only one side has it.
+    rows = []
+    current, previous = document['results'], baseline['results']
+    for key in sorted(set(current) | set(previous)):
+        if key not in previous:
+            rows.append((key, None, current[key]['min'], None, 'new'))
+        elif key not in current:
+            rows.append((key, previous[key]['min'], None, None, 'missing'))
+        else:
+            before, after = previous[key]['min'], current[key]['min']
+            ratio = after / before if before > 0 else float('inf')
+            if ratio > 1 + tolerance:
+                status = 'slower'
+            elif ratio < 1 / (1 + tolerance):
+                status = 'faster'
+            else:
+                status = 'ok'
+            rows.append((key, before, after, ratio, status))
+    return rows
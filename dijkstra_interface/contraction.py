@@ -0,0 +1,279 @@
+# contraction.py
+
+import heapq
+import math
+import mmap
+import struct
+import sys
+from array import array
+
+# Binary index layout (all array data in native byte order, each array
+# starting on an 8 byte boundary):
+#   header    magic, version, little endian flag, nodes, up edges, down edges
+#   node_ids  int64[nodes]
+#   up        offsets int32[nodes + 1], targets int32, weights float64, middles int32
+#   down      offsets int32[nodes + 1], targets int32, weights float64, middles int32
+MAGIC = b'DJCH'
+VERSION = 1
+_HEADER = struct.Struct('<4sIIQQQ')
+
+
+def _padding(size):
+    return -size % 8
+
+
+class ContractionHierarchy:
+    # Preprocessed index for fast point-to-point queries on a graph whose
+    # weights don't change. Nodes are contracted one by one in order of
+    # importance; shortcuts keep the distances between the remaining nodes.
+    # A query then only walks edges going up in that order, from both ends.
+    #
+    # up[v] holds edges v -> x and down[v] holds edges u -> v, where x and u
+    # were contracted after v. middles is -1 for original edges and the
+    # bypassed node for shortcuts, which is how paths are unpacked.
+    def __init__(self, node_ids, up, down, buffer=None, views=()):
+        self.node_ids = node_ids
+        self.index_of = {node_id: i for i, node_id in enumerate(node_ids)}
+        self.up_offsets, self.up_targets, self.up_weights, self.up_middles = up
+        self.down_offsets, self.down_targets, self.down_weights, self.down_middles = down
+        self.buffer = buffer  # mmap the arrays live in, when loaded from a file
+        self.views = views  # memoryviews into buffer, released on close
+
+    @classmethod
+    def build(cls, graph, witness_limit=60):
+        # witness_limit bounds how many nodes a witness search may settle;
+        # lower is faster to build but may add unnecessary shortcuts
+        frozen = graph.freeze()
+        n = len(frozen)
+        out_adj = [{} for _ in range(n)]  # v -> {x: (weight, middle)}
+        in_adj = [{} for _ in range(n)]  # v -> {u: (weight, middle)}
+        for v in range(n):
+            for x, weight in frozen.neighbors(v):
+                if x != v and weight < out_adj[v].get(x, (math.inf,))[0]:
+                    out_adj[v][x] = (weight, -1)
+                    in_adj[x][v] = (weight, -1)
+
+        def shortcuts_for(v):
+            shortcuts = []
+            for u, (w1, _) in in_adj[v].items():
+                targets = {x: w1 + w2 for x, (w2, _) in out_adj[v].items() if x != u}
+                if not targets:
+                    continue
+                witness = _witness_search(out_adj, u, v, max(targets.values()), witness_limit)
+                for x, weight in targets.items():
+                    if witness.get(x, math.inf) > weight:
+                        shortcuts.append((u, x, weight))
+            return shortcuts
+
+        deleted_neighbors = [0] * n
+
+        def priority(v, shortcuts):
+            return len(shortcuts) - len(in_adj[v]) - len(out_adj[v]) + deleted_neighbors[v]
+
+        queue = [(priority(v, shortcuts_for(v)), v) for v in range(n)]
+        heapq.heapify(queue)
+        up_lists = [None] * n
+        down_lists = [None] * n
+
+        while queue:
+            _, v = heapq.heappop(queue)
+            shortcuts = shortcuts_for(v)
+            current = priority(v, shortcuts)
+            if queue and current > queue[0][0]:
+                # Priority went up since it was queued, try again later
+                heapq.heappush(queue, (current, v))
+                continue
+
+            up_lists[v] = [(x, weight, middle) for x, (weight, middle) in out_adj[v].items()]
+            down_lists[v] = [(u, weight, middle) for u, (weight, middle) in in_adj[v].items()]
+            for u in in_adj[v]:
+                del out_adj[u][v]
+                deleted_neighbors[u] += 1
+            for x in out_adj[v]:
+                del in_adj[x][v]
+                deleted_neighbors[x] += 1
+            for u, x, weight in shortcuts:
+                if weight < out_adj[u].get(x, (math.inf,))[0]:
+                    out_adj[u][x] = (weight, v)
+                    in_adj[x][u] = (weight, v)
+            out_adj[v] = {}
+            in_adj[v] = {}
+
+        return cls(list(frozen.node_ids), _to_csr(up_lists), _to_csr(down_lists))
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def query(self, source_id, target_id):
+        # Returns (distance, path) where path is a list of node ids; distance
+        # is inf and path empty when target can't be reached
+        source, target = self.index_of[source_id], self.index_of[target_id]
+        if source == target:
+            return 0, [source_id]
+        distances = ({source: 0}, {target: 0})
+        parents = ({}, {})  # node -> (node it was reached from, edge index)
+        queues = ([(0, source)], [(0, target)])
+        arrays = ((self.up_offsets, self.up_targets, self.up_weights),
+                  (self.down_offsets, self.down_targets, self.down_weights))
+        best = math.inf
+        meeting_node = -1
+
+        while True:
+            # Advance whichever side still has keys below the best distance
+            keys = [queue[0][0] if queue and queue[0][0] < best else math.inf for queue in queues]
+            if keys[0] == keys[1] == math.inf:
+                break
+            side = 0 if keys[0] <= keys[1] else 1
+            current_distance, current = heapq.heappop(queues[side])
+            own, other = distances[side], distances[1 - side]
+            if current_distance > own[current]:
+                continue
+            if current in other and current_distance + other[current] < best:
+                best = current_distance + other[current]
+                meeting_node = current
+
+            offsets, targets, weights = arrays[side]
+            for i in range(offsets[current], offsets[current + 1]):
+                neighbor = targets[i]
+                new_distance = current_distance + weights[i]
+                if new_distance < own.get(neighbor, math.inf):
+                    own[neighbor] = new_distance
+                    parents[side][neighbor] = (current, i)
+                    heapq.heappush(queues[side], (new_distance, neighbor))
+
+        if meeting_node < 0:
+            return math.inf, []
+        return best, [self.node_ids[i] for i in self._unpack(meeting_node, parents, source, target)]
+
+    def distance(self, source_id, target_id):
+        return self.query(source_id, target_id)[0]
+
+    def _unpack(self, meeting_node, parents, source, target):
+        # Hierarchy edges from source up to the meeting node and back down to
+        # target, as (from, to, middle)
+        edges = []
+        node = meeting_node
+        while node != source:
+            parent, i = parents[0][node]
+            edges.append((parent, node, self.up_middles[i]))
+            node = parent
+        edges.reverse()
+        node = meeting_node
+        while node != target:
+            child, i = parents[1][node]
+            edges.append((node, child, self.down_middles[i]))
+            node = child
+
+        path = [source]
+        stack = list(reversed(edges))
+        while stack:
+            start, end, middle = stack.pop()
+            if middle < 0:
+                path.append(end)
+                continue
+            # start -> middle is in down[middle], middle -> end in up[middle]
+            first = self._find(self.down_offsets, self.down_targets, middle, start)
+            second = self._find(self.up_offsets, self.up_targets, middle, end)
+            stack.append((middle, end, self.up_middles[second]))
+            stack.append((start, middle, self.down_middles[first]))
+        return path
+
+    def _find(self, offsets, targets, node, target):
+        for i in range(offsets[node], offsets[node + 1]):
+            if targets[i] == target:
+                return i
+        raise ValueError("Corrupt contraction hierarchy: missing shortcut half")
+
+    def save(self, path):
+        # Node ids are stored as 64-bit integers, like in graph_io's binary
+        # files, so graphs with other ids can't be saved
+        try:
+            node_ids = array('q', self.node_ids)
+        except (TypeError, OverflowError):
+            raise ValueError("Only graphs whose node ids are integers can be saved as an index") from None
+        up = (self.up_offsets, self.up_targets, self.up_weights, self.up_middles)
+        down = (self.down_offsets, self.down_targets, self.down_weights, self.down_middles)
+        with open(path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, sys.byteorder == 'little',
+                                 len(node_ids), len(self.up_targets), len(self.down_targets)))
+            f.write(bytes(_padding(_HEADER.size)))
+            for data in (node_ids,) + up + down:
+                raw = memoryview(data).cast('B')
+                f.write(raw)
+                f.write(bytes(_padding(len(raw))))
+
+    @classmethod
+    def load(cls, path):
+        # Memory-maps the file; the arrays are read straight from the page
+        # cache instead of being copied into Python objects
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, little_endian, n, up_count, down_count = _HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a contraction hierarchy index")
+        if version != VERSION:
+            raise ValueError(f"Unsupported index version {version}, expected {VERSION}")
+        if bool(little_endian) != (sys.byteorder == 'little'):
+            raise ValueError("Index was written on a machine with a different byte order")
+
+        views = [memoryview(buffer)]
+        position = _HEADER.size + _padding(_HEADER.size)
+
+        def take(code, count):
+            nonlocal position
+            size = struct.calcsize(code) * count
+            raw = views[0][position:position + size]
+            data = raw.cast(code)
+            views.extend((raw, data))
+            position += size + _padding(size)
+            return data
+
+        node_ids = take('q', n).tolist()
+        up = (take('i', n + 1), take('i', up_count), take('d', up_count), take('i', up_count))
+        down = (take('i', n + 1), take('i', down_count), take('d', down_count), take('i', down_count))
+        return cls(node_ids, up, down, buffer, views)
+
+    def close(self):
+        if self.buffer is not None:
+            for view in reversed(self.views):
+                view.release()
+            self.views = ()
+            self.buffer.close()
+            self.buffer = None
+
+
+def _witness_search(out_adj, source, skip, limit, max_settled):
+    # Dijkstra from source that avoids skip and gives up past limit or after
+    # settling max_settled nodes. Any distance it finds is a real path length.
+    distances = {source: 0}
+    queue = [(0, source)]
+    settled = 0
+    while queue:
+        current_distance, current = heapq.heappop(queue)
+        if current_distance > distances[current]:
+            continue
+        if current_distance > limit or settled >= max_settled:
+            break
+        settled += 1
+        for neighbor, (weight, _) in out_adj[current].items():
+            if neighbor == skip:
+                continue
+            new_distance = current_distance + weight
+            if new_distance < distances.get(neighbor, math.inf):
+                distances[neighbor] = new_distance
+                heapq.heappush(queue, (new_distance, neighbor))
+    return distances
+
+
+def _to_csr(lists):
+    offsets = array('i', [0])
+    targets = array('i')
+    weights = array('d')
+    middles = array('i')
+    for entries in lists:
+        for target, weight, middle in entries:
+            targets.append(target)
+            weights.append(weight)
+            middles.append(middle)
+        offsets.append(len(targets))
+    return offsets, targets, weights, middles
@@ -1,12 +1,612 @@
 # dijkstra.py
 
+import bisect
 import heapq
+import itertools
+import math
+import time
+from array import array
+
+from instrumentation import COUNTERS
+from landmarks import Landmarks
+from priority_queue import QUEUES
+
+
+def solve(graph, start_node, end_node=None, strategy='dijkstra', stats=None, queue=None):
+    # Headless shortest path computation: no visualizer, no generator.
+    # Returns (distances, previous, path); nodes that were never reached are
+    # absent from distances. If end_node is given the search stops once it
+    # is settled. strategy is one of STRATEGIES; the goal directed ones need
+    # an end_node. If a stats dict is given the number of settled nodes is
+    # stored in it, and for the inline dijkstra and A* loops the rest of
+    # instrumentation.COUNTERS too. queue picks one of priority_queue.QUEUES
+    # instead of the inline heapq loop, for the dijkstra strategy only.
+    if strategy != 'dijkstra':
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {strategy}")
+        if queue is not None:
+            raise ValueError(f"The {strategy} strategy has its own queue, queue only applies to dijkstra")
+        if end_node is None:
+            raise ValueError(f"The {strategy} strategy needs an end node")
+        return STRATEGIES[strategy](graph, start_node, end_node, stats)
+    if queue is not None:
+        return _solve_with_queue(start_node, end_node, stats, QUEUES[queue]())
+
+    distances = {start_node: 0}
+    previous = {}
+    visited = set()
+    counter = itertools.count()
+    queue = [(0, next(counter), start_node)]
+    peak = 1
+
+    while queue:
+        current_distance, _, current_node = heapq.heappop(queue)
+        if current_node in visited:
+            continue
+        visited.add(current_node)
+        if current_node is end_node:
+            break
+
+        for edge in current_node.edges:
+            neighbor = edge.destination
+            new_distance = current_distance + edge.weight
+            if new_distance < distances.get(neighbor, math.inf):
+                distances[neighbor] = new_distance
+                previous[neighbor] = current_node
+                heapq.heappush(queue, (new_distance, next(counter), neighbor))
+        if len(queue) > peak:
+            peak = len(queue)
+
+    if stats is not None:
+        _count_search(stats, visited, end_node, next(counter), len(queue), peak)
+    path = build_path(previous, start_node, end_node) if end_node is not None else []
+    return distances, previous, path
+
+
+def _count_search(stats, visited, end_node, pushes, left, peak):
+    # Counters of a heap search that skips stale entries, worked out from
+    # where it ended rather than counted operation by operation. Every push
+    # after the first is an improvement, and the end node is settled but
+    # its edges are never relaxed.
+    pops = pushes - left
+    relaxations = sum(len(node.edges) for node in visited)
+    if end_node in visited:
+        relaxations -= len(end_node.edges)
+    stats.update(settled=len(visited), pushes=pushes, pops=pops, stale_pops=pops - len(visited),
+                 relaxations=relaxations, improvements=pushes - 1, peak_queue=peak)
+
+
+def _solve_with_queue(start_node, end_node, stats, queue):
+    distances = {start_node: 0}
+    previous = {}
+    settled = 0
+    queue.update(start_node, 0)
+
+    while queue:
+        current_distance, current_node = queue.pop()
+        settled += 1
+        if current_node is end_node:
+            break
+
+        for edge in current_node.edges:
+            neighbor = edge.destination
+            new_distance = current_distance + edge.weight
+            if new_distance < distances.get(neighbor, math.inf):
+                distances[neighbor] = new_distance
+                previous[neighbor] = current_node
+                queue.update(neighbor, new_distance)
+
+    if stats is not None:
+        stats['settled'] = settled
+    path = build_path(previous, start_node, end_node) if end_node is not None else []
+    return distances, previous, path
+
+
+def euclidean_heuristic(graph, end_node):
+    # Straight line distance to end_node, scaled down so it never
+    # overestimates the remaining weight even when weights aren't geometric
+    scale = graph.heuristic_scale if graph.heuristic_scale != math.inf else 0
+    end_x, end_y = end_node.x, end_node.y
+
+    def heuristic(node):
+        return scale * math.hypot(node.x - end_x, node.y - end_y)
+    return heuristic
+
+
+def landmark_heuristic(graph, end_node):
+    # ALT lower bounds from landmarks.py. The landmarks are chosen on first
+    # use and kept on the graph, where they follow its edits. They are
+    # chosen again once the graph has more than doubled since, as landmarks
+    # picked among the first few nodes say little about the rest, and their
+    # tables recomputed once edits that raised weights have worn the bounds
+    # down.
+    landmarks = graph.landmarks
+    if landmarks is None or len(graph.nodes) > 2 * len(landmarks.nodes):
+        if landmarks is not None:
+            landmarks.detach()
+        graph.landmarks = Landmarks(graph)
+    elif landmarks.stale():
+        landmarks.refresh()
+    return graph.landmarks.heuristic(end_node)
+
+
+# Strategy -> function(graph, end_node) giving its A* heuristic
+HEURISTICS = {
+    'astar': euclidean_heuristic,
+    'alt': landmark_heuristic,
+}
+
+
+def solve_astar(graph, start_node, end_node, stats=None, heuristic=None):
+    if heuristic is None:
+        heuristic = euclidean_heuristic(graph, end_node)
+    distances = {start_node: 0}
+    previous = {}
+    visited = set()
+    counter = itertools.count()
+    queue = [(heuristic(start_node), next(counter), start_node)]
+    peak = 1
+
+    while queue:
+        _, _, current_node = heapq.heappop(queue)
+        if current_node in visited:
+            continue
+        visited.add(current_node)
+        if current_node is end_node:
+            break
+
+        current_distance = distances[current_node]
+        for edge in current_node.edges:
+            neighbor = edge.destination
+            new_distance = current_distance + edge.weight
+            if new_distance < distances.get(neighbor, math.inf):
+                distances[neighbor] = new_distance
+                previous[neighbor] = current_node
+                heapq.heappush(queue, (new_distance + heuristic(neighbor), next(counter), neighbor))
+        if len(queue) > peak:
+            peak = len(queue)
+
+    if stats is not None:
+        _count_search(stats, visited, end_node, next(counter), len(queue), peak)
+    return distances, previous, build_path(previous, start_node, end_node)
+
+
+def solve_alt(graph, start_node, end_node, stats=None):
+    # A* guided by landmark bounds instead of straight line distance
+    return solve_astar(graph, start_node, end_node, stats, landmark_heuristic(graph, end_node))
+
+
+def solve_bidirectional(graph, start_node, end_node, stats=None):
+    # Forward search from start_node and backward search (over incoming
+    # edges) from end_node, always advancing the side with the smaller key.
+    # Stops once the two smallest keys add up to at least the best path
+    # found through a node seen by both sides.
+    if start_node is end_node:
+        if stats is not None:
+            stats['settled'] = 1
+        return {start_node: 0}, {}, [start_node]
+
+    distances = ({start_node: 0}, {end_node: 0})
+    previous = ({}, {})  # Backward side maps a node to the next one towards end_node
+    visited = (set(), set())
+    counter = itertools.count()
+    queues = ([(0, next(counter), start_node)], [(0, next(counter), end_node)])
+    best = math.inf
+    meeting_node = None
+
+    while queues[0] and queues[1]:
+        if queues[0][0][0] + queues[1][0][0] >= best:
+            break
+        side = 0 if queues[0][0][0] <= queues[1][0][0] else 1
+        current_distance, _, current_node = heapq.heappop(queues[side])
+        if current_node in visited[side]:
+            continue
+        visited[side].add(current_node)
+
+        own, other = distances[side], distances[1 - side]
+        edges = current_node.edges if side == 0 else graph.incoming.get(current_node, ())
+        for edge in edges:
+            neighbor = edge.destination if side == 0 else edge.source
+            new_distance = current_distance + edge.weight
+            if new_distance < own.get(neighbor, math.inf):
+                own[neighbor] = new_distance
+                previous[side][neighbor] = current_node
+                heapq.heappush(queues[side], (new_distance, next(counter), neighbor))
+                if neighbor in other and new_distance + other[neighbor] < best:
+                    best = new_distance + other[neighbor]
+                    meeting_node = neighbor
+
+    if stats is not None:
+        stats['settled'] = len(visited[0]) + len(visited[1])
+    if meeting_node is None:
+        return distances[0], previous[0], []
+
+    # Stitch the backward half onto the forward results
+    result_distances = dict(distances[0])
+    result_previous = dict(previous[0])
+    node = meeting_node
+    while node is not end_node:
+        next_node = previous[1][node]
+        result_previous[next_node] = node
+        result_distances[next_node] = best - distances[1][next_node]
+        node = next_node
+    return result_distances, result_previous, build_path(result_previous, start_node, end_node)
+
+
+STRATEGIES = {
+    'dijkstra': solve,
+    'astar': solve_astar,
+    'alt': solve_alt,
+    'bidirectional': solve_bidirectional,
+}
+
+
+def build_path(previous, start_node, end_node):
+    # Walk the predecessor map back from end_node; empty list if unreachable
+    if end_node is not start_node and end_node not in previous:
+        return []
+    path = [end_node]
+    node = end_node
+    while node is not start_node:
+        node = previous[node]
+        path.append(node)
+    path.reverse()
+    return path
+
+
+def solve_frozen(frozen, source, target=-1, queue=None, workspace=None):
+    # Same as solve() but over a FrozenGraph, using node indices instead of
+    # Node objects. Returns (distances, previous, path) where distances is an
+    # array of floats (inf when unreached), previous an array of indices (-1
+    # for none) and path a list of indices. With a SearchWorkspace the
+    # arrays are not allocated per call: distances and previous are views
+    # into the workspace, valid until its next search.
+    if queue is not None:
+        return _solve_frozen_with_queue(frozen, source, target, QUEUES[queue]())
+    if workspace is not None:
+        return workspace.solve(frozen, source, target)
+    n = len(frozen)
+    offsets, targets, weights = frozen.offsets, frozen.targets, frozen.weights
+    distances = array('d', [math.inf]) * n
+    previous = array('i', [-1]) * n
+    visited = bytearray(n)
+    distances[source] = 0
+    queue = [(0, source)]
+
+    while queue:
+        current_distance, current = heapq.heappop(queue)
+        if visited[current]:
+            continue
+        visited[current] = 1
+        if current == target:
+            break
+
+        for i in range(offsets[current], offsets[current + 1]):
+            neighbor = targets[i]
+            new_distance = current_distance + weights[i]
+            if new_distance < distances[neighbor]:
+                distances[neighbor] = new_distance
+                previous[neighbor] = current
+                heapq.heappush(queue, (new_distance, neighbor))
+
+    return distances, previous, build_frozen_path(distances, previous, target)
+
+
+def _solve_frozen_with_queue(frozen, source, target, queue):
+    n = len(frozen)
+    offsets, targets, weights = frozen.offsets, frozen.targets, frozen.weights
+    distances = array('d', [math.inf]) * n
+    previous = array('i', [-1]) * n
+    distances[source] = 0
+    queue.update(source, 0)
+
+    while queue:
+        current_distance, current = queue.pop()
+        if current == target:
+            break
+
+        for i in range(offsets[current], offsets[current + 1]):
+            neighbor = targets[i]
+            new_distance = current_distance + weights[i]
+            if new_distance < distances[neighbor]:
+                distances[neighbor] = new_distance
+                previous[neighbor] = current
+                queue.update(neighbor, new_distance)
+
+    return distances, previous, build_frozen_path(distances, previous, target)
+
+
+def build_frozen_path(distances, previous, target):
+    path = []
+    if target >= 0 and distances[target] != math.inf:
+        node = target
+        while node != -1:
+            path.append(node)
+            node = previous[node]
+        path.reverse()
+    return path
+
+
+class SearchWorkspace:
+    # Arrays for running many searches one after another over FrozenGraphs
+    # of up to size nodes, allocated once. Each search takes the next two
+    # stamps: stamps[i] is set to the first when node i is reached and to
+    # the second when it is settled. Anything below the first was left by
+    # an earlier search and reads as unreached, so starting a search is O(1)
+    # and a search only costs time for the nodes it actually reaches. A
+    # target a few hops away is found without touching the rest of a large
+    # graph.
+    STAMP_LIMIT = 2 ** 32 - 1  # Stamps fit an array('L') on every platform
+
+    def __init__(self, size=0):
+        self.size = 0
+        self.distances = array('d')
+        self.previous = array('i')
+        self.stamps = array('L')
+        self.reached = 0  # Stamps of the current search
+        self.settled = 0
+        self.reserve(size)
+
+    def reserve(self, size):
+        # Grow to hold size nodes; new entries start out unreached
+        if size > self.size:
+            extra = size - self.size
+            self.distances.extend(array('d', [math.inf]) * extra)
+            self.previous.extend(array('i', [-1]) * extra)
+            self.stamps.extend(array('L', [0]) * extra)
+            self.size = size
+
+    def reset(self):
+        if self.settled + 2 > self.STAMP_LIMIT:
+            # Stamps would wrap around, clear them the slow way once
+            self.stamps = array('L', [0]) * self.size
+            self.settled = 0
+        self.reached, self.settled = self.settled + 1, self.settled + 2
+
+    def distance(self, i):
+        return self.distances[i] if self.stamps[i] >= self.reached else math.inf
+
+    def solve(self, frozen, source, target=-1):
+        self.reserve(len(frozen))
+        self.reset()
+        reached, settled = self.reached, self.settled
+        offsets, targets, weights = frozen.offsets, frozen.targets, frozen.weights
+        distances, previous, stamps = self.distances, self.previous, self.stamps
+        distances[source] = 0
+        previous[source] = -1
+        stamps[source] = reached
+        queue = [(0, source)]
+
+        while queue:
+            current_distance, current = heapq.heappop(queue)
+            if stamps[current] == settled:
+                continue
+            stamps[current] = settled
+            if current == target:
+                break
+
+            for i in range(offsets[current], offsets[current + 1]):
+                neighbor = targets[i]
+                new_distance = current_distance + weights[i]
+                if stamps[neighbor] < reached:
+                    stamps[neighbor] = reached
+                elif new_distance >= distances[neighbor]:
+                    continue
+                distances[neighbor] = new_distance
+                previous[neighbor] = current
+                heapq.heappush(queue, (new_distance, neighbor))
+
+        distances = _StampedView(distances, stamps, reached, math.inf, len(frozen))
+        previous = _StampedView(previous, stamps, reached, -1, len(frozen))
+        return distances, previous, build_frozen_path(distances, previous, target)
+
+
+class _StampedView:
+    # Read-only array over the workspace entries one search wrote
+    __slots__ = ('values', 'stamps', 'reached', 'default', 'size')
+
+    def __init__(self, values, stamps, reached, default, size):
+        self.values = values
+        self.stamps = stamps
+        self.reached = reached
+        self.default = default
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.size:
+            raise IndexError(i)
+        return self.values[i] if self.stamps[i] >= self.reached else self.default
+
+    def __iter__(self):
+        return (self[i] for i in range(self.size))
+
+
+# Event records of search_events, plain tuples so they are cheap to queue:
+#   (SETTLE, node, distance)          node taken off the queue for good
+#   (RELAX, node, parent, distance)   a shorter way to node through parent
+#   (PATH, path, distance)            target settled, path is a list of nodes
+#   (DONE, stats)                     search over, stats as in solve()
+#   (TREE, distances, previous)       with_tree only, the full shortest path
+#                                     tree from source, just before DONE
+SETTLE, RELAX, PATH, DONE, TREE = range(5)
+
+
+def search_events(frozen, source, target=-1, heuristic=None, with_tree=False):
+    # solve_frozen as a stream of events, for replaying a search somewhere
+    # other than where it runs. Nodes are FrozenGraph indices. heuristic is
+    # an optional sequence of per-node lower bounds on the distance to
+    # target, which makes it A*. with_tree carries the same search on past
+    # target, without events, until it has the whole tree.
+    n = len(frozen)
+    offsets, targets, weights = frozen.offsets, frozen.targets, frozen.weights
+    distances = array('d', [math.inf]) * n
+    previous = array('i', [-1]) * n
+    visited = bytearray(n)
+    distances[source] = 0
+    queue = [(heuristic[source] if heuristic else 0, source)]
+    pushes = settled = relaxations = 0
+    peak = 1
+
+    while queue:
+        _, current = heapq.heappop(queue)
+        if visited[current]:
+            continue
+        visited[current] = 1
+        settled += 1
+        current_distance = distances[current]
+        yield SETTLE, current, current_distance
+        if current == target:
+            break
+
+        start, end = offsets[current], offsets[current + 1]
+        relaxations += end - start
+        for i in range(start, end):
+            neighbor = targets[i]
+            new_distance = current_distance + weights[i]
+            if new_distance < distances[neighbor]:
+                distances[neighbor] = new_distance
+                previous[neighbor] = current
+                heapq.heappush(queue, (new_distance + heuristic[neighbor] if heuristic else new_distance, neighbor))
+                pushes += 1
+                yield RELAX, neighbor, current, new_distance
+        if len(queue) > peak:
+            peak = len(queue)
+
+    if target >= 0 and distances[target] != math.inf:
+        yield PATH, build_frozen_path(distances, previous, target), distances[target]
+    pops = pushes + 1 - len(queue)
+    if with_tree:
+        yield (TREE,) + _finish_tree(frozen, queue, distances, previous, target, heuristic)
+    yield DONE, {'settled': settled, 'pushes': pushes + 1, 'pops': pops, 'stale_pops': pops - settled,
+                 'relaxations': relaxations, 'improvements': pushes, 'peak_queue': peak}
+
+
+def _finish_tree(frozen, queue, distances, previous, target, heuristic):
+    # Carries a search stopped at target on until every reachable node has
+    # its shortest distance, keying the queue by distance alone. Plain
+    # Dijkstra only has to go on from its queue and target, which was
+    # settled but never expanded. A heuristic may have settled nodes too
+    # early, so then every node reached so far starts again, and nodes may
+    # be improved more than once.
+    offsets, targets, weights = frozen.offsets, frozen.targets, frozen.weights
+    if heuristic:
+        queue = [(distance, node) for node, distance in enumerate(distances) if distance != math.inf]
+    else:
+        queue = [(distances[node], node) for _, node in queue]
+        if target >= 0 and distances[target] != math.inf:
+            queue.append((distances[target], target))
+    heapq.heapify(queue)
+    while queue:
+        current_distance, current = heapq.heappop(queue)
+        if current_distance > distances[current]:
+            continue
+        for i in range(offsets[current], offsets[current + 1]):
+            neighbor = targets[i]
+            new_distance = current_distance + weights[i]
+            if new_distance < distances[neighbor]:
+                distances[neighbor] = new_distance
+                previous[neighbor] = current
+                heapq.heappush(queue, (new_distance, neighbor))
+    return distances, previous
+
+
+_MISSING = object()  # Marks a key that was absent before a change
+
+
+class UndoLog:
+    # Records only the entries of distances/previous/visited that change while
+    # the algorithm runs, grouped into steps (one step per settled node).
+    # Step s is the state just before node s is processed, which is what the
+    # old full-copy state_stack used to hold. A few full checkpoints are kept
+    # so that seeking far away does not have to walk every change.
+    def __init__(self, checkpoint_interval=1024):
+        self.checkpoint_interval = checkpoint_interval
+        self.changes = []  # (name, key, old, new)
+        self.step_starts = []  # Index into changes where each step begins
+        self.step_nodes = []  # Node being processed in each step
+        self.checkpoints = {}  # step -> (distances, previous, visited)
+        self.position = 0  # Number of changes currently applied
+
+    def __len__(self):
+        return len(self.step_starts)
+
+    def at_head(self):
+        return self.position == len(self.changes)
+
+    def begin_step(self, node, distances, previous, visited):
+        step = len(self.step_starts)
+        if step and step % self.checkpoint_interval == 0:
+            self.checkpoints[step] = (distances.copy(), previous.copy(), set(visited))
+        self.step_starts.append(len(self.changes))
+        self.step_nodes.append(node)
+
+    def record(self, name, key, old, new):
+        self.changes.append((name, key, old, new))
+        self.position += 1
+
+    def current_step(self):
+        # Step whose start is the closest one at or before the position
+        return bisect.bisect_right(self.step_starts, self.position) - 1
+
+    def seek(self, step, state):
+        # Move state (a dict with 'distances', 'previous' and 'visited') to the
+        # start of the given step, or to the live head when step == len(self).
+        # Returns the set of keys whose entries may have changed.
+        target = self.step_starts[step] if step < len(self) else len(self.changes)
+        touched = set()
+        checkpoint = max((s for s in self.checkpoints if self.step_starts[s] <= target), default=None)
+        if checkpoint is not None:
+            start = self.step_starts[checkpoint]
+            if target - start < abs(target - self.position):
+                distances, previous, visited = self.checkpoints[checkpoint]
+                touched.update(state['distances'], state['visited'], distances, visited)
+                self._load(state, distances, previous, visited)
+                self.position = start
+        changes = self.changes
+        while self.position > target:
+            self.position -= 1
+            touched.add(changes[self.position][1])
+            self._apply(state, changes[self.position], undo=True)
+        while self.position < target:
+            touched.add(changes[self.position][1])
+            self._apply(state, changes[self.position], undo=False)
+            self.position += 1
+        return touched
+
+    def _load(self, state, distances, previous, visited):
+        state['distances'].clear()
+        state['distances'].update(distances)
+        state['previous'].clear()
+        state['previous'].update(previous)
+        state['visited'].clear()
+        state['visited'].update(visited)
+
+    def _apply(self, state, change, undo):
+        name, key, old, new = change
+        value = old if undo else new
+        if name == 'visited':
+            if value:
+                state['visited'].add(key)
+            else:
+                state['visited'].discard(key)
+        elif value is _MISSING:
+            state[name].pop(key, None)
+        else:
+            state[name][key] = value
 
 
 class DijkstraAlgorithm:
-    def __init__(self, graph, visualizer):
+    def __init__(self, graph, visualizer=None, strategy='dijkstra', instrumentation=None, cache=None):
         self.graph = graph
+        # Optional result_cache.ResultCache consulted by headless runs; its
+        # results are shared, so don't modify distances/previous/path
+        self.cache = cache
         self.visualizer = visualizer
+        self.strategy = strategy  # Key of STRATEGIES
+        self.stats = {}  # Filled with instrumentation.COUNTERS as the run goes
         self.queue = []
         self.distances = {}
         self.previous = {}
@@ -16,48 +616,93 @@ class DijkstraAlgorithm:
         self.counter = 0  # Initialize a counter for heap entries
         self.generator = None  # Will hold the generator object
         # Get the speed from the visualizer's speed slider
-        self.speed = self.visualizer.speed_slider.get()
-        self.state_stack = []  # Stack to keep track of states
+        self.speed = self.visualizer.speed_slider.get() if self.visualizer else 1.0
+        # Changes made at each step, for stepping back. Keep the number of
+        # full checkpoints small so memory stays proportional to the changes.
+        self.history = UndoLog(max(1024, len(graph.nodes) // 8))
+        self.path = []
+        # Optional instrumentation.Instrumentation timing the run; the
+        # visualizer is wrapped so time spent in its callbacks is known
+        self.instrumentation = instrumentation
+        if instrumentation is not None:
+            instrumentation.stats = self.stats
+            if visualizer is not None:
+                self.visualizer = instrumentation.wrap(visualizer)
+
+    def _timed(self, name, work, *args):
+        instrumentation = self.instrumentation
+        callback_time = instrumentation.callback_time
+        started = time.perf_counter()
+        try:
+            return work(*args)
+        finally:
+            instrumentation.step(name, started, time.perf_counter(),
+                                 instrumentation.callback_time - callback_time, len(self.queue))
 
 
 
     def run(self, start_node, end_node):
+        if self.instrumentation is not None:
+            return self._timed('run', self._run, start_node, end_node)
+        return self._run(start_node, end_node)
+
+    def _run(self, start_node, end_node):
+        if self.visualizer is None:
+            # Nothing to observe the steps, compute the result in one go
+            solver = solve if self.cache is None else self.cache.solve
+            self.distances, self.previous, self.path = solver(
+                self.graph, start_node, end_node, self.strategy, self.stats)
+            return self.distances, self.previous, self.path
+        if self.strategy == 'bidirectional':
+            # Two interleaved frontiers don't fit the single car animation,
+            # show the result directly
+            self.distances, self.previous, self.path = solve(
+                self.graph, start_node, end_node, self.strategy, self.stats)
+            for node in self.path:
+                node.distance = self.distances[node]
+                self.visualizer.update_node_distance(node)
+            self.visualizer.on_algorithm_complete(self.distances, self.previous)
+            return
         self.generator = self.algorithm(start_node, end_node)
         # Start the algorithm without advancing it
         try:
             next(self.generator)
         except StopIteration:
-            # The algorithm completed without needing steps
-            self.visualizer.on_algorithm_complete(self.distances, self.previous)
+            # Completed without needing steps; algorithm() has already
+            # reported it to the visualizer
             self.generator = None
 
 
     def algorithm(self, start_node, end_node):
-        self.distances = {node: float('inf') for node in self.graph.nodes.values()}
-        self.distances[start_node] = 0
+        # Only nodes the search reaches get entries, so a run near the start
+        # doesn't pay for the size of the graph
+        self.distances = {start_node: 0}
         start_node.distance = 0
         self.visualizer.update_node_distance(start_node)
-        queue = []
+        if self.strategy in HEURISTICS:
+            heuristic = HEURISTICS[self.strategy](self.graph, end_node)
+        else:
+            heuristic = lambda node: 0
+        queue = self.queue = []
         self.counter += 1
-        heapq.heappush(queue, (0, self.counter, start_node))
+        heapq.heappush(queue, (heuristic(start_node), self.counter, start_node))
+        stats = self.stats
+        stats.update(dict.fromkeys(COUNTERS, 0), pushes=1, peak_queue=1)
 
         while queue:
-            current_distance, _, current_node = heapq.heappop(queue)
+            _, _, current_node = heapq.heappop(queue)
+            stats['pops'] += 1
 
             if current_node in self.visited:
+                stats['stale_pops'] += 1
                 continue
 
-            # Save the state before processing
-            state = {
-                'queue': list(queue),
-                'visited': set(self.visited),
-                'distances': self.distances.copy(),
-                'previous': self.previous.copy(),
-                'current_node': current_node,
-            }
-            self.state_stack.append(state)
+            # Start a new step in the history before processing
+            self.history.begin_step(current_node, self.distances, self.previous, self.visited)
 
             self.visited.add(current_node)
+            stats['settled'] += 1
+            self.history.record('visited', current_node, False, True)
             self.visualizer.highlight_node(current_node, 'yellow')
 
             # Move the car to current_node instantly
@@ -72,15 +717,28 @@ class DijkstraAlgorithm:
             for edge in current_node.edges:
                 neighbor = edge.destination
                 new_distance = self.distances[current_node] + edge.weight
+                stats['relaxations'] += 1
 
-                if new_distance < self.distances[neighbor]:
+                if new_distance < self.distances.get(neighbor, math.inf):
+                    stats['improvements'] += 1
+                    self.history.record('distances', neighbor, self.distances.get(neighbor, _MISSING), new_distance)
+                    old_parent = self.previous.get(neighbor)
+                    self.history.record('previous', neighbor, self.previous.get(neighbor, _MISSING), current_node)
                     self.distances[neighbor] = new_distance
                     neighbor.distance = new_distance
                     self.previous[neighbor] = current_node
 
                     self.counter += 1
-                    heapq.heappush(queue, (new_distance, self.counter, neighbor))
+                    heapq.heappush(queue, (new_distance + heuristic(neighbor), self.counter, neighbor))
+                    stats['pushes'] += 1
+                    if len(queue) > stats['peak_queue']:
+                        stats['peak_queue'] = len(queue)
 
+                    if old_parent is not None:
+                        # Replaced in the tree, as restore_state draws it
+                        old_edge = self.graph.find_edge(old_parent, neighbor)
+                        if old_edge:
+                            self.visualizer.highlight_edge(old_edge, 'black')
                     self.visualizer.highlight_edge(edge, 'blue')
                     self.visualizer.highlight_node(neighbor, 'orange')
                     self.visualizer.update_node_distance(neighbor)
@@ -100,15 +758,62 @@ class DijkstraAlgorithm:
         self.visualizer.on_algorithm_complete(self.distances, self.previous)
 
     def step_forward(self):
+        if self.instrumentation is not None:
+            return self._timed('step', self._step_forward)
+        return self._step_forward()
+
+    def _step_forward(self):
+        if not self.history.at_head():
+            # Replay recorded history until we are back at the live state
+            self.seek(self.history.current_step() + 1)
+            return
         if self.generator is None:
             return  # Algorithm has completed
         try:
             self.generator.send(None)
         except StopIteration:
-            # Algorithm has completed
-            self.visualizer.on_algorithm_complete(self.distances, self.previous)
+            # Algorithm has completed, algorithm() reported it already
             self.generator = None
 
+    def step_backward(self):
+        if self.instrumentation is not None:
+            return self._timed('step back', self._step_backward)
+        return self._step_backward()
+
+    def _step_backward(self):
+        step = self.history.current_step()
+        if self.history.at_head() and step >= 0 and self.history.position > self.history.step_starts[step]:
+            # Live state is part way through the step, go back to its start
+            self.seek(step)
+        elif step > 0:
+            self.seek(step - 1)
+
+    def seek(self, step):
+        # Show the state at the start of the given step; len(self.history)
+        # returns to the live state so the generator can continue
+        step = max(0, min(step, len(self.history)))
+        state = {'distances': self.distances, 'previous': self.previous, 'visited': self.visited}
+        history = self.history
+        shown_step = history.current_step()
+        # Only the entries the log touched differ, so the cost follows the
+        # distance seeked rather than the size of the graph
+        changed = history.seek(step, state)
+        for node in changed:
+            node.distance = self.distances.get(node, math.inf)
+        if step < len(history):
+            current_node = history.step_nodes[step]
+        else:
+            current_node = history.step_nodes[-1] if len(history) else None
+        # The node processed at either end of the seek changes look too
+        if shown_step >= 0:
+            changed.add(history.step_nodes[shown_step])
+        if current_node:
+            changed.add(current_node)
+        if self.visualizer:
+            car_position = (None, None, current_node.x, current_node.y, False) if current_node else None
+            self.visualizer.restore_state(self.distances, self.previous, self.visited, current_node, car_position,
+                                          changed)
+
     def pause(self):
         self.paused = True
 
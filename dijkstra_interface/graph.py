@@ -1,5 +1,6 @@
 # graph.py
 import math  # Add this import for infinity
+from array import array
 
 class Node:
     def __init__(self, node_id, x, y, node_type='intermediate'):
@@ -20,37 +21,408 @@ class Edge:
         self.weight = weight
         self.directed = directed
 
+# Slot based variants of Node and Edge for large graphs built outside the GUI.
+# They behave the same as Node/Edge but carry no per-instance __dict__.
+class CompactNode:
+    __slots__ = ('id', 'x', 'y', 'edges', 'node_type', 'distance', 'graphics', 'visited')
+
+    def __init__(self, node_id, x, y, node_type='intermediate'):
+        self.id = node_id
+        self.x = x
+        self.y = y
+        self.edges = []
+        self.node_type = node_type
+        self.distance = math.inf
+
+    def add_edge(self, edge):
+        self.edges.append(edge)
+
+class CompactEdge:
+    __slots__ = ('source', 'destination', 'weight', 'directed', 'graphics')
+
+    def __init__(self, source, destination, weight, directed=False):
+        self.source = source
+        self.destination = destination
+        self.weight = weight
+        self.directed = directed
+
+class FrozenGraph:
+    # Read-only compressed sparse row snapshot of a Graph. Nodes are numbered
+    # 0..n-1 in insertion order; the outgoing edges of node i are
+    # targets[offsets[i]:offsets[i + 1]] with matching weights.
+    def __init__(self, graph):
+        self.node_ids = list(graph.nodes)
+        self.index_of = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        self.offsets = array('i', [0])
+        self.targets = array('i')
+        self.weights = array('d')
+        index_of = self.index_of
+        for node in graph.nodes.values():
+            for edge in node.edges:
+                self.targets.append(index_of[edge.destination.id])
+                self.weights.append(edge.weight)
+            self.offsets.append(len(self.targets))
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def neighbors(self, index):
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return zip(self.targets[start:end], self.weights[start:end])
+
+    def nbytes(self):
+        # Size of the adjacency arrays, not counting the id map
+        return sum(a.itemsize * len(a) for a in (self.offsets, self.targets, self.weights))
+
+def point_to_segment_distance(px, py, x1, y1, x2, y2):
+    # Compute the distance from point (px, py) to the segment (x1, y1)-(x2, y2)
+    line_mag = math.hypot(x2 - x1, y2 - y1)
+    if line_mag < 1e-8:
+        return math.hypot(px - x1, py - y1)
+
+    u = ((px - x1) * (x2 - x1) + (py - y1) * (y2 - y1)) / (line_mag ** 2)
+    if u < 0 or u > 1:
+        # Closest point does not fall within the segment
+        return min(math.hypot(px - x1, py - y1), math.hypot(px - x2, py - y2))
+    # Intersecting point is within the segment
+    return math.hypot(px - (x1 + u * (x2 - x1)), py - (y1 + u * (y2 - y1)))
+
+class SpatialGrid:
+    # Hierarchy of uniform grids. Level k has cells of cell_size * 2**k and
+    # an item is stored at the lowest level where its bounding box spans at
+    # most 2x2 cells, so long edges cost as little to index as short ones.
+    # Lookups check the few cells around the rectangle on every level.
+    #
+    # Segments go only in the cells they actually cross, walked from one end
+    # to the other, not in every cell of their bounding box: a long diagonal
+    # edge would otherwise turn up for clicks anywhere near it. Their level
+    # is the lowest where they cross at most about 2 * SEGMENT_CELLS cells,
+    # which bounds the memory of very long edges in dense graphs.
+    SEGMENT_CELLS = 16
+
+    def __init__(self, cell_size=40):
+        self.cell_size = cell_size
+        self.levels = {}  # level -> {(cx, cy): [items]}
+
+    def _level(self, x1, y1, x2, y2):
+        span = max(abs(x2 - x1), abs(y2 - y1))
+        level = 0
+        while span > self.cell_size << level:
+            level += 1
+        return level
+
+    def _cells(self, level, x1, y1, x2, y2):
+        size = self.cell_size << level
+        for cx in range(int(min(x1, x2) // size), int(max(x1, x2) // size) + 1):
+            for cy in range(int(min(y1, y2) // size), int(max(y1, y2) // size) + 1):
+                yield cx, cy
+
+    def _segment_cells(self, level, x1, y1, x2, y2):
+        # Cells the segment passes through, stepping into whichever of the
+        # next column or row it reaches first
+        size = self.cell_size << level
+        cx, cy = int(x1 // size), int(y1 // size)
+        end_x, end_y = int(x2 // size), int(y2 // size)
+        dx, dy = x2 - x1, y2 - y1
+        step_x = 1 if end_x > cx else -1
+        step_y = 1 if end_y > cy else -1
+        # Position along the segment (0 to 1) of the next column and row
+        # boundary, and how far apart the boundaries are
+        next_x = ((cx + (step_x > 0)) * size - x1) / dx if dx else math.inf
+        next_y = ((cy + (step_y > 0)) * size - y1) / dy if dy else math.inf
+        delta_x = size / abs(dx) if dx else math.inf
+        delta_y = size / abs(dy) if dy else math.inf
+        yield cx, cy
+        # Counting the steps keeps rounding from walking past the end cell
+        for _ in range(abs(end_x - cx) + abs(end_y - cy)):
+            if cy == end_y or (cx != end_x and next_x < next_y):
+                cx += step_x
+                next_x += delta_x
+            else:
+                cy += step_y
+                next_y += delta_y
+            yield cx, cy
+
+    def _placement(self, segment, x1, y1, x2, y2):
+        if segment:
+            level = self._level(x1, y1, x2, y2)
+            level = max(0, level - self.SEGMENT_CELLS.bit_length() + 1)
+            return level, self._segment_cells(level, x1, y1, x2, y2)
+        level = self._level(x1, y1, x2, y2)
+        return level, self._cells(level, x1, y1, x2, y2)
+
+    def insert(self, item, x1, y1, x2, y2, segment=False):
+        # segment: the item is the line from (x1, y1) to (x2, y2) rather
+        # than the box they span
+        level, placement = self._placement(segment, x1, y1, x2, y2)
+        cells = self.levels.setdefault(level, {})
+        for cell in placement:
+            cells.setdefault(cell, []).append(item)
+
+    def remove(self, item, x1, y1, x2, y2, segment=False):
+        # Same coordinates and segment flag as it was inserted with
+        level, placement = self._placement(segment, x1, y1, x2, y2)
+        cells = self.levels.get(level, {})
+        for cell in placement:
+            items = cells.get(cell)
+            if items and item in items:
+                items.remove(item)
+                if not items:
+                    del cells[cell]
+
+    def query(self, x1, y1, x2, y2):
+        # Items whose cells overlap the rectangle, each reported once
+        found = {}
+        for level, cells in self.levels.items():
+            for cell in self._cells(level, x1, y1, x2, y2):
+                for item in cells.get(cell, ()):
+                    found[id(item)] = item
+        return list(found.values())
+
 class Graph:
     def __init__(self):
         self.nodes = {}
         self.edges = []
         self.start_node = None
         self.end_node = None
+        # Spatial indexes for hit-testing, built on first use so bulk loads
+        # and headless use don't pay for them
+        self._node_index = None
+        self._edge_index = None
+        self.edge_lookup = {}  # (source, destination) -> parallel edges
+        self.reverse_edges = {}  # Undirected edge -> its generated twin, both ways
+        self.generated_edges = set()  # The twins themselves
+        self.incoming = {}  # Node -> edges ending at it, for backward searches
+        # Largest factor that keeps scale * straight line distance below the
+        # weight of every edge, so A* can use it as an admissible heuristic
+        self.heuristic_scale = math.inf
+        self.landmarks = None  # landmarks.Landmarks for ALT queries, built on first use
+        # Callbacks called as listener(event, edge, old_weight) after an edge
+        # is added ('add'), removed ('remove') or reweighted ('weight')
+        self.listeners = []
+        # Bumped by every change that can alter a search result: nodes and
+        # edges added, weights or directions edited, start or end moved
+        self.version = 0
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+    def _notify(self, event, edge, old_weight=None):
+        for listener in self.listeners:
+            listener(event, edge, old_weight)
 
     def add_node(self, node):
         self.nodes[node.id] = node
+        self.version += 1
+        if self._node_index is not None:
+            self._node_index.insert(node, node.x, node.y, node.x, node.y)
 
     def add_edge(self, edge):
+        self.version += 1
         self.edges.append(edge)
         edge.source.add_edge(edge)
+        # Only the edge that was drawn goes in the spatial index, its reverse
+        # lies on the same segment
+        self._index_edge(edge)
+        self.edge_lookup.setdefault((edge.source, edge.destination), []).append(edge)
+        self.incoming.setdefault(edge.destination, []).append(edge)
+        self._update_heuristic_scale(edge)
+        self._notify('add', edge)
         if not edge.directed:
-            reverse_edge = Edge(edge.destination, edge.source, edge.weight, directed=False)
-            self.edges.append(reverse_edge)
-            edge.destination.add_edge(reverse_edge)
+            self._add_reverse_edge(edge)
+
+    def add_edges(self, edges):
+        # Bulk version of add_edge for loaders: the bookkeeping is done per
+        # batch and the twins of undirected edges are built in one pass with
+        # the same class as their edge
+        if self.listeners:
+            for edge in edges:
+                self.add_edge(edge)
+            return
+        edges = list(edges)
+        self.version += 1
+        reverse_edges = [type(edge)(edge.destination, edge.source, edge.weight, False)
+                         for edge in edges if not edge.directed]
+        self.edges.extend(edges)
+        self.edges.extend(reverse_edges)
+        lookup, incoming = self.edge_lookup, self.incoming
+        for edge in edges + reverse_edges:
+            edge.source.edges.append(edge)
+            lookup.setdefault((edge.source, edge.destination), []).append(edge)
+            incoming.setdefault(edge.destination, []).append(edge)
+        for edge in edges:
+            self._index_edge(edge)
+            self._update_heuristic_scale(edge)
+        undirected = (edge for edge in edges if not edge.directed)
+        for edge, reverse_edge in zip(undirected, reverse_edges):
+            self.reverse_edges[edge] = reverse_edge
+            self.reverse_edges[reverse_edge] = edge
+        self.generated_edges.update(reverse_edges)
+
+    def drawn_edges(self):
+        # Edges as they were added, without the generated twins
+        return [edge for edge in self.edges if edge not in self.generated_edges]
+
+    def _add_reverse_edge(self, edge):
+        reverse_edge = type(edge)(edge.destination, edge.source, edge.weight, directed=False)
+        self.edges.append(reverse_edge)
+        edge.destination.add_edge(reverse_edge)
+        self.edge_lookup.setdefault((reverse_edge.source, reverse_edge.destination), []).append(reverse_edge)
+        self.incoming.setdefault(reverse_edge.destination, []).append(reverse_edge)
+        self.reverse_edges[edge] = reverse_edge
+        self.reverse_edges[reverse_edge] = edge
+        self.generated_edges.add(reverse_edge)
+        self._notify('add', reverse_edge)
+
+    def _remove_reverse_edge(self, edge):
+        reverse_edge = self.reverse_edges.pop(edge)
+        del self.reverse_edges[reverse_edge]
+        self.generated_edges.discard(reverse_edge)
+        self.edges.remove(reverse_edge)
+        reverse_edge.source.edges.remove(reverse_edge)
+        self.incoming[reverse_edge.destination].remove(reverse_edge)
+        key = (reverse_edge.source, reverse_edge.destination)
+        self.edge_lookup[key].remove(reverse_edge)
+        if not self.edge_lookup[key]:
+            del self.edge_lookup[key]
+        self._notify('remove', reverse_edge)
 
-    def get_node_at(self, x, y):
-        for node in self.nodes.values():
-            if (node.x - x) ** 2 + (node.y - y) ** 2 <= 400:  # within 20 pixels radius
-                return node
-        return None
+    def _update_heuristic_scale(self, edge):
+        length = math.hypot(edge.destination.x - edge.source.x, edge.destination.y - edge.source.y)
+        if length > 0:
+            self.heuristic_scale = min(self.heuristic_scale, edge.weight / length)
+
+    def get_reverse_edge(self, edge):
+        return self.reverse_edges.get(edge)
+
+    def find_edge(self, source, destination):
+        # Lightest edge from source to destination, or None
+        edges = self.edge_lookup.get((source, destination))
+        if not edges:
+            return None
+        return min(edges, key=lambda edge: edge.weight)
+
+    def update_edge(self, edge, weight=None, directed=None):
+        # Change an edge in place, keeping the twin of an undirected edge in
+        # sync: it is created or dropped when the direction changes
+        if weight is not None and weight != edge.weight:
+            self.version += 1
+            old_weight = edge.weight
+            edge.weight = weight
+            reverse_edge = self.reverse_edges.get(edge)
+            if reverse_edge:
+                reverse_edge.weight = weight
+            # Heavier edges leave the old scale admissible, lighter ones may not
+            self._update_heuristic_scale(edge)
+            self._notify('weight', edge, old_weight)
+            if reverse_edge:
+                self._notify('weight', reverse_edge, old_weight)
+        if directed is not None and directed != edge.directed:
+            self.version += 1
+            if edge not in self.reverse_edges and directed is False:
+                edge.directed = False
+                self._add_reverse_edge(edge)
+            elif edge in self.reverse_edges and directed is True:
+                self._remove_reverse_edge(edge)
+                edge.directed = True
+
+    @property
+    def node_index(self):
+        if self._node_index is None:
+            self._node_index = SpatialGrid()
+            for node in self.nodes.values():
+                self._node_index.insert(node, node.x, node.y, node.x, node.y)
+        return self._node_index
+
+    @property
+    def edge_index(self):
+        if self._edge_index is None:
+            self._edge_index = SpatialGrid()
+            for edge in self.drawn_edges():
+                self._index_edge(edge)
+        return self._edge_index
+
+    def _index_edge(self, edge, remove=False):
+        if self._edge_index is None:
+            return
+        x1, y1 = edge.source.x, edge.source.y
+        x2, y2 = edge.destination.x, edge.destination.y
+        if remove:
+            self._edge_index.remove(edge, x1, y1, x2, y2, segment=True)
+        else:
+            self._edge_index.insert(edge, x1, y1, x2, y2, segment=True)
+
+    def move_node(self, node, x, y):
+        indexed_edges = []
+        if self._edge_index is not None:
+            indexed_edges = [edge for edge in self._edge_index.query(node.x, node.y, node.x, node.y)
+                             if edge.source is node or edge.destination is node]
+        if self._node_index is not None:
+            self._node_index.remove(node, node.x, node.y, node.x, node.y)
+        for edge in indexed_edges:
+            self._index_edge(edge, remove=True)
+        node.x, node.y = x, y
+        if self._node_index is not None:
+            self._node_index.insert(node, x, y, x, y)
+        for edge in indexed_edges:
+            self._index_edge(edge)
+        for edge in node.edges + self.incoming.get(node, []):
+            self._update_heuristic_scale(edge)
+
+    def get_node_at(self, x, y, radius=20):
+        closest = None
+        closest_distance = radius ** 2  # within 20 pixels radius by default
+        for node in self.node_index.query(x - radius, y - radius, x + radius, y + radius):
+            distance = (node.x - x) ** 2 + (node.y - y) ** 2
+            if distance <= closest_distance:
+                closest, closest_distance = node, distance
+        return closest
+
+    def get_edges_near(self, x, y, tolerance):
+        # Candidate edges for a hit-test; callers check the exact distance
+        return self.edge_index.query(x - tolerance, y - tolerance, x + tolerance, y + tolerance)
+
+    def get_edge_at(self, x, y, tolerance=5):
+        # Closest drawn edge within tolerance of the point
+        closest = None
+        for edge in self.get_edges_near(x, y, tolerance):
+            x1, y1 = edge.source.x, edge.source.y
+            x2, y2 = edge.destination.x, edge.destination.y
+            distance = point_to_segment_distance(x, y, x1, y1, x2, y2)
+            if distance <= tolerance:
+                closest, tolerance = edge, distance
+        return closest
+
+    def get_nodes_in_rect(self, x1, y1, x2, y2):
+        left, right = min(x1, x2), max(x1, x2)
+        top, bottom = min(y1, y2), max(y1, y2)
+        return [node for node in self.node_index.query(x1, y1, x2, y2)
+                if left <= node.x <= right and top <= node.y <= bottom]
+
+    def get_edges_in_rect(self, x1, y1, x2, y2):
+        # Edges whose bounding box overlaps the rectangle and that pass
+        # through a grid cell it touches, which includes every edge
+        # crossing it
+        left, right = min(x1, x2), max(x1, x2)
+        top, bottom = min(y1, y2), max(y1, y2)
+        return [edge for edge in self.edge_index.query(x1, y1, x2, y2)
+                if min(edge.source.x, edge.destination.x) <= right
+                and max(edge.source.x, edge.destination.x) >= left
+                and min(edge.source.y, edge.destination.y) <= bottom
+                and max(edge.source.y, edge.destination.y) >= top]
 
     def set_start_node(self, node):
+        self.version += 1
         if self.start_node:
             self.start_node.node_type = 'intermediate'
         self.start_node = node
         node.node_type = 'start'
 
     def set_end_node(self, node):
+        self.version += 1
         if self.end_node:
             self.end_node.node_type = 'intermediate'
         self.end_node = node
@@ -61,3 +433,6 @@ class Graph:
 
     def get_end_node(self):
         return self.end_node
+
+    def freeze(self):
+        return FrozenGraph(self)
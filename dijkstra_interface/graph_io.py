@@ -0,0 +1,376 @@
+# graph_io.py
+
+import contextlib
+import csv
+import gc
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from graph import CompactEdge, CompactNode, Graph
+
+# Binary graph layout (array data in native byte order, each array starting
+# on an 8 byte boundary):
+#   header    magic, version, little endian flag, nodes, edges, start, end
+#             (start/end are node indices, -1 when not set)
+#   nodes     ids int64, x float64, y float64
+#   edges     sources int32, targets int32 (node indices), weights float64,
+#             directed uint8
+# Only the edges as drawn are stored; twins of undirected edges are rebuilt
+# on load.
+MAGIC = b'DJGR'
+VERSION = 1
+_HEADER = struct.Struct('<4sIIQQqq')
+
+HEADER_NAMES = ('source', 'src', 'from')  # First column of an optional header row
+CHUNK_SIZE = 10000  # Edges handed to Graph.add_edges at a time
+
+
+def _padding(size):
+    return -size % 8
+
+
+@contextlib.contextmanager
+def _gc_paused():
+    # Building millions of node/edge objects keeps triggering the cyclic
+    # garbage collector, which rescans everything built so far. None of
+    # these objects are garbage, so hold it off until the load is done.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _bad_line(path, number, problem):
+    # Malformed input is reported as ValueError, which callers already
+    # handle for files that can't be parsed at all
+    return ValueError(f"{path}, line {number}: {problem}")
+
+
+def _parse_weight(value):
+    # Dijkstra needs finite, non-negative weights; a NaN or negative one
+    # would quietly give wrong paths instead of failing
+    weight = float(value)
+    if not 0 <= weight < math.inf:
+        raise ValueError(f"weight {weight} is not a finite non-negative number")
+    return weight
+
+
+def _parse_id(text):
+    try:
+        return int(text)
+    except ValueError:
+        return text
+
+
+def _get_node(graph, node_id):
+    # Nodes seen only in edges are laid out on a grid in order of appearance
+    node = graph.nodes.get(node_id)
+    if node is None:
+        index = len(graph.nodes)
+        node = CompactNode(node_id, (index % 100) * 50 + 25, (index // 100) * 50 + 25)
+        graph.add_node(node)
+    return node
+
+
+def _place_node(graph, node_id, x, y):
+    node = graph.nodes.get(node_id)
+    if node is None:
+        graph.add_node(CompactNode(node_id, x, y))
+    else:
+        graph.move_node(node, x, y)
+
+
+def load_edge_list(path, delimiter=None, directed=False, nodes_path=None):
+    # Reads one edge per line: source target [weight [directed]]. Fields are
+    # split on whitespace, or parsed as CSV when a delimiter is given. Lines
+    # starting with '#' and a header row are skipped. Weight defaults to 1
+    # and direction to the directed argument. nodes_path may name a file of
+    # 'id x y [type]' rows in the same format to place the nodes, type
+    # being start or end for those two.
+    with _gc_paused():
+        return _load_edge_list(path, delimiter, directed, nodes_path)
+
+
+def _load_edge_list(path, delimiter, directed, nodes_path):
+    graph = Graph()
+    ends = {}  # 'start'/'end' -> node id
+    if nodes_path:
+        for number, row in _read_rows(nodes_path, delimiter):
+            if len(row) < 3:
+                raise _bad_line(nodes_path, number, "expected an id, x and y")
+            try:
+                x, y = float(row[1]), float(row[2])
+            except ValueError as error:
+                raise _bad_line(nodes_path, number, error) from None
+            node_id = _parse_id(row[0])
+            _place_node(graph, node_id, x, y)
+            if len(row) > 3 and row[3].strip() in ('start', 'end'):
+                ends[row[3].strip()] = node_id
+
+    batch = []
+    for number, row in _read_rows(path, delimiter):
+        if len(row) < 2:
+            raise _bad_line(path, number, "expected a source and a target")
+        try:
+            weight = _parse_weight(row[2]) if len(row) > 2 else 1.0
+        except ValueError as error:
+            raise _bad_line(path, number, error) from None
+        edge_directed = directed if len(row) < 4 else row[3].strip().lower() in ('1', 'true', 'yes')
+        source = _get_node(graph, _parse_id(row[0]))
+        destination = _get_node(graph, _parse_id(row[1]))
+        batch.append(CompactEdge(source, destination, weight, edge_directed))
+        if len(batch) >= CHUNK_SIZE:
+            graph.add_edges(batch)
+            batch = []
+    graph.add_edges(batch)
+    if 'start' in ends:
+        graph.set_start_node(graph.nodes[ends['start']])
+    if 'end' in ends:
+        graph.set_end_node(graph.nodes[ends['end']])
+    return graph
+
+
+def nodes_path_for(path):
+    # Companion file holding the nodes of a CSV edge list: graph.csv ->
+    # graph.nodes.csv
+    base, extension = os.path.splitext(path)
+    return base + '.nodes' + extension
+
+
+def _read_rows(path, delimiter):
+    # (line number, fields) of every row holding data
+    with open(path, newline='') as f:
+        rows = csv.reader(f, delimiter=delimiter) if delimiter else (line.split() for line in f)
+        for number, row in enumerate(rows, 1):
+            if not row or row[0].startswith('#') or row[0].strip().lower() in HEADER_NAMES + ('id',):
+                continue
+            yield number, row
+
+
+def save_edge_list(graph, path, delimiter=',', nodes_path=None):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f, delimiter=delimiter)
+        writer.writerow(['source', 'target', 'weight', 'directed'])
+        for edge in graph.drawn_edges():
+            writer.writerow([edge.source.id, edge.destination.id, edge.weight, int(edge.directed)])
+    if nodes_path:
+        with open(nodes_path, 'w', newline='') as f:
+            writer = csv.writer(f, delimiter=delimiter)
+            writer.writerow(['id', 'x', 'y', 'type'])
+            for node in graph.nodes.values():
+                node_type = node.node_type if node.node_type in ('start', 'end') else ''
+                writer.writerow([node.id, node.x, node.y, node_type])
+
+
+def load_jsonl(path):
+    # JSON Lines, one object per line:
+    #   {"id": 0, "x": 10, "y": 20}
+    #   {"source": 0, "target": 1, "weight": 2.5, "directed": false}
+    #   {"start": 0} / {"end": 1}
+    with _gc_paused():
+        return _load_jsonl(path)
+
+
+def _load_jsonl(path):
+    graph = Graph()
+    batch = []
+    start_id = end_id = None
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+                if not isinstance(item, dict):
+                    raise ValueError("expected a JSON object")
+                if 'source' in item:
+                    source = _get_node(graph, item['source'])
+                    destination = _get_node(graph, item['target'])
+                    batch.append(CompactEdge(source, destination, _parse_weight(item.get('weight', 1.0)),
+                                             bool(item.get('directed', False))))
+                elif 'id' in item:
+                    _place_node(graph, item['id'], float(item['x']), float(item['y']))
+                elif 'start' in item:
+                    start_id = item['start']
+                elif 'end' in item:
+                    end_id = item['end']
+            except KeyError as error:
+                raise _bad_line(path, number, f"missing {error.args[0]!r}") from None
+            except (TypeError, ValueError) as error:  # Also unhashable ids and bad numbers
+                raise _bad_line(path, number, error) from None
+            if len(batch) >= CHUNK_SIZE:
+                graph.add_edges(batch)
+                batch = []
+    graph.add_edges(batch)
+    for node_id, set_node in ((start_id, graph.set_start_node), (end_id, graph.set_end_node)):
+        if node_id is not None:
+            if node_id not in graph.nodes:
+                raise ValueError(f"{path}: unknown start or end node {node_id!r}")
+            set_node(graph.nodes[node_id])
+    return graph
+
+
+def save_jsonl(graph, path):
+    with open(path, 'w') as f:
+        for node in graph.nodes.values():
+            f.write(json.dumps({'id': node.id, 'x': node.x, 'y': node.y}) + '\n')
+        for edge in graph.drawn_edges():
+            f.write(json.dumps({'source': edge.source.id, 'target': edge.destination.id,
+                                'weight': edge.weight, 'directed': edge.directed}) + '\n')
+        if graph.start_node:
+            f.write(json.dumps({'start': graph.start_node.id}) + '\n')
+        if graph.end_node:
+            f.write(json.dumps({'end': graph.end_node.id}) + '\n')
+
+
+def save_binary(graph, path):
+    index_of = {node_id: i for i, node_id in enumerate(graph.nodes)}
+    nodes = graph.nodes.values()
+    edges = graph.drawn_edges()
+    arrays = (
+        array('q', graph.nodes),  # Raises TypeError for non integer ids
+        array('d', (node.x for node in nodes)),
+        array('d', (node.y for node in nodes)),
+        array('i', (index_of[edge.source.id] for edge in edges)),
+        array('i', (index_of[edge.destination.id] for edge in edges)),
+        array('d', (edge.weight for edge in edges)),
+        array('B', (edge.directed for edge in edges)),
+    )
+    start = index_of[graph.start_node.id] if graph.start_node else -1
+    end = index_of[graph.end_node.id] if graph.end_node else -1
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, sys.byteorder == 'little', len(index_of), len(edges), start, end))
+        f.write(bytes(_padding(_HEADER.size)))
+        for data in arrays:
+            raw = memoryview(data).cast('B')
+            f.write(raw)
+            f.write(bytes(_padding(len(raw))))
+
+
+class BinaryGraph:
+    # Memory-mapped view of a file written by save_binary. The arrays are
+    # memoryviews into the page cache, nothing is copied until used.
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if not os.fstat(f.fileno()).st_size:
+                raise ValueError(f"{path} is empty")
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.views = [memoryview(self.buffer)]
+        try:
+            self._read_header()
+        except BaseException:
+            self.close()
+            raise
+
+    def _read_header(self):
+        path = self.path
+        if len(self.buffer) < _HEADER.size:
+            raise ValueError(f"{path} is not a binary graph file")
+        magic, version, little_endian, n, m, self.start, self.end = _HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a binary graph file")
+        if version != VERSION:
+            raise ValueError(f"Unsupported graph file version {version}, expected {VERSION}")
+        if bool(little_endian) != (sys.byteorder == 'little'):
+            raise ValueError("Graph file was written on a machine with a different byte order")
+        if not (-1 <= self.start < n and -1 <= self.end < n):
+            raise ValueError(f"{path} has a start or end node out of range")
+
+        self.position = _HEADER.size + _padding(_HEADER.size)
+        self.node_ids = self._take('q', n)
+        self.xs = self._take('d', n)
+        self.ys = self._take('d', n)
+        self.sources = self._take('i', m)
+        self.targets = self._take('i', m)
+        self.weights = self._take('d', m)
+        self.directed = self._take('B', m)
+        # Edge ends index the nodes; negative ones would silently wrap
+        for ends in (self.sources, self.targets):
+            if m and (min(ends) < 0 or max(ends) >= n):
+                raise ValueError(f"{path} has edges to nodes out of range")
+        if not all(0 <= weight < math.inf for weight in self.weights):
+            raise ValueError(f"{path} has negative or non-finite edge weights")
+
+    def _take(self, code, count):
+        size = struct.calcsize(code) * count
+        if self.position + size > len(self.buffer):
+            raise ValueError(f"{self.path} is truncated")
+        raw = self.views[0][self.position:self.position + size]
+        data = raw.cast(code)
+        self.views.extend((raw, data))
+        self.position += size + _padding(size)
+        return data
+
+    def to_graph(self):
+        graph = Graph()
+        nodes = [CompactNode(node_id, x, y) for node_id, x, y in zip(self.node_ids, self.xs, self.ys)]
+        for node in nodes:
+            graph.add_node(node)
+        for start in range(0, len(self.sources), CHUNK_SIZE):
+            stop = start + CHUNK_SIZE
+            graph.add_edges(
+                CompactEdge(nodes[source], nodes[target], weight, bool(directed))
+                for source, target, weight, directed in zip(
+                    self.sources[start:stop], self.targets[start:stop],
+                    self.weights[start:stop], self.directed[start:stop]))
+        if self.start >= 0:
+            graph.set_start_node(nodes[self.start])
+        if self.end >= 0:
+            graph.set_end_node(nodes[self.end])
+        return graph
+
+    def close(self):
+        for view in reversed(self.views):
+            view.release()
+        self.views = []
+        self.buffer.close()
+
+
+def load_binary(path):
+    mapped = BinaryGraph(path)
+    try:
+        with _gc_paused():
+            return mapped.to_graph()
+    finally:
+        mapped.close()
+
+
+def _check_not_json(path):
+    # A plain .json document isn't one object per line, so the JSON Lines
+    # parser would fail on it with a confusing line error
+    if path.endswith('.json'):
+        raise ValueError(f"{path}: graphs are stored as JSON Lines, use a .jsonl file")
+
+
+def load_graph(path):
+    # Pick the loader from the file extension
+    _check_not_json(path)
+    if path.endswith('.jsonl'):
+        return load_jsonl(path)
+    if path.endswith('.csv'):
+        nodes_path = nodes_path_for(path)
+        return load_edge_list(path, delimiter=',', nodes_path=nodes_path if os.path.exists(nodes_path) else None)
+    if path.endswith('.dgb'):
+        return load_binary(path)
+    return load_edge_list(path)
+
+
+def save_graph(graph, path):
+    _check_not_json(path)
+    if path.endswith('.dgb'):
+        save_binary(graph, path)
+    elif path.endswith('.csv'):
+        # An edge list alone loses node positions, isolated nodes and the
+        # start and end, so they go in a companion file
+        save_edge_list(graph, path, nodes_path=nodes_path_for(path))
+    else:
+        save_jsonl(graph, path)
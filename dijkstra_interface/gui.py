@@ -1,75 +1,334 @@
 # gui.py
 
 import tkinter as tk
-from tkinter import messagebox, simpledialog
+from tkinter import filedialog, messagebox, simpledialog
 from graph import Node, Edge, Graph
-from dijkstra import DijkstraAlgorithm
+import graph_io
+from dijkstra import DijkstraAlgorithm, HEURISTICS, PATH, RELAX, SETTLE, DONE
+from instrumentation import Instrumentation
+from result_cache import ResultCache
+from solver_worker import FAILED, TREE, SolverWorker
+from shortest_path_tree import ShortestPathTree
 from tkinter import Scale, HORIZONTAL
-from PIL import Image, ImageTk
+import collections
+import itertools
 import math
+import os
+import time
+
+# Assets live next to this file, wherever the program is started from
+CAR_IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "car.png")
+CAR_SIZE = 30  # Sprite width and height in pixels
+
+
+def car_sprite_cache():
+    # Where the car scaled to CAR_SIZE is kept between runs
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'dijkstra_interface', f'car_{CAR_SIZE}.png')
+
+
+def load_car_photo():
+    # Tk reads PNG files itself, so once the scaled sprite is cached neither
+    # Pillow nor the resize is needed. Without a cache Pillow scales the
+    # original and saves the result. Returns None when there is no image.
+    cache = car_sprite_cache()
+    try:
+        if os.path.getmtime(cache) >= os.path.getmtime(CAR_IMAGE):
+            return tk.PhotoImage(file=cache)
+    except (OSError, tk.TclError):
+        pass
+    try:
+        from PIL import Image, ImageTk
+    except ImportError:
+        return None
+    try:
+        image = Image.open(CAR_IMAGE).resize((CAR_SIZE, CAR_SIZE), Image.LANCZOS)
+    except OSError:
+        return None
+    try:
+        os.makedirs(os.path.dirname(cache), exist_ok=True)
+        image.save(cache)
+    except OSError:
+        pass  # Not cached this time, the sprite still shows
+    return ImageTk.PhotoImage(image)
+
+
+class CanvasRenderer:
+    # Holds the scene in world coordinates and only turns the items inside
+    # the view into canvas objects; everything else is just a record here.
+    # Option changes are sent to the canvas once per frame, and only for
+    # items on screen whose options actually differ from what they show.
+    def __init__(self, canvas, root):
+        self.canvas = canvas
+        self.root = root
+        self.ids = itertools.count(1)
+        self.items = {}  # item -> [kind, world coords, tags, options]
+        self.on_canvas = {}  # item -> canvas id, for items currently drawn
+        self.shown = {}  # item -> options as last sent to the canvas
+        self.pending = {}  # item -> options still to send
+        self.scheduled = False
+        # View transform: screen = (world - origin) * scale
+        self.scale = 1.0
+        self.origin_x = 0.0
+        self.origin_y = 0.0
+
+    def create(self, kind, coords, tags=(), **options):
+        # kind is a canvas item type ('oval', 'line', 'text', ...); returns
+        # the item, which is only drawn once show() asks for it
+        item = next(self.ids)
+        self.items[item] = [kind, coords, tags, options]
+        return item
+
+    def delete(self, item):
+        self.hide(item)
+        self.items.pop(item, None)
+
+    def configure(self, item, **options):
+        self.items[item][3].update(options)
+        if item not in self.on_canvas:
+            return
+        shown = self.shown[item]
+        for key, value in options.items():
+            if shown.get(key) == value:
+                pending = self.pending.get(item)
+                if pending:
+                    pending.pop(key, None)
+            else:
+                self.pending.setdefault(item, {})[key] = value
+        if self.pending and not self.scheduled:
+            self.scheduled = True
+            self.root.after_idle(self.flush)
+
+    def configure_tag(self, tag, items, **options):
+        # One canvas call for every drawn item carrying tag; items must be
+        # all the items with that tag so the records stay right
+        self.flush()
+        self.canvas.itemconfig(tag, **options)
+        for item in items:
+            self.items[item][3].update(options)
+            if item in self.on_canvas:
+                self.shown[item].update(options)
+
+    def show(self, items):
+        # Make the given items, and no others, exist on the canvas
+        wanted = set(items)
+        for item in [item for item in self.on_canvas if item not in wanted]:
+            self.hide(item)
+        for item in items:
+            if item not in self.on_canvas:
+                kind, coords, tags, options = self.items[item]
+                self.on_canvas[item] = getattr(self.canvas, 'create_' + kind)(
+                    *self.to_screen(*coords), tags=tags + ('scene',), **options)
+                self.shown[item] = dict(options)
+                self.pending.pop(item, None)
+
+    def hide(self, item):
+        canvas_id = self.on_canvas.pop(item, None)
+        if canvas_id is not None:
+            self.canvas.delete(canvas_id)
+            del self.shown[item]
+            self.pending.pop(item, None)
+
+    def to_screen(self, *coords):
+        # Flat x, y, x, y... world coordinates to screen coordinates
+        return [(value - (self.origin_y if i % 2 else self.origin_x)) * self.scale
+                for i, value in enumerate(coords)]
+
+    def to_world(self, x, y):
+        return x / self.scale + self.origin_x, y / self.scale + self.origin_y
+
+    def set_view(self, scale, origin_x, origin_y):
+        # Two canvas calls move every drawn item to the new view
+        self.canvas.scale('scene', 0, 0, scale / self.scale, scale / self.scale)
+        self.canvas.move('scene', (self.origin_x - origin_x) * scale, (self.origin_y - origin_y) * scale)
+        self.scale, self.origin_x, self.origin_y = scale, origin_x, origin_y
+
+    def forget(self):
+        # The canvas was cleared, drop every record
+        self.items.clear()
+        self.on_canvas.clear()
+        self.shown.clear()
+        self.pending.clear()
+
+    def flush(self):
+        self.scheduled = False
+        pending, self.pending = self.pending, {}
+        for item, options in pending.items():
+            if options:
+                self.canvas.itemconfig(self.on_canvas[item], **options)
+                self.shown[item].update(options)
+
+
+class AnimationScheduler:
+    # Runs one animation at a time from the wall clock: every frame draws
+    # the position for the time elapsed so far, so a slow frame makes the
+    # next one jump ahead instead of stretching the animation.
+    FRAME_MS = 16
+
+    def __init__(self, root):
+        self.root = root
+        self.job = None
+        self.on_frame = None
+        self.on_done = None
+
+    @property
+    def running(self):
+        return self.on_done is not None
+
+    def start(self, duration_ms, on_frame, on_done):
+        self.cancel()
+        self.on_frame = on_frame
+        self.on_done = on_done
+        if duration_ms <= 0:
+            # Nothing to show, finish from the event loop rather than from
+            # inside the caller
+            self.job = self.root.after(0, self.finish)
+            return
+        self.started = time.perf_counter()
+        self.duration = duration_ms / 1000
+        self._tick()
+
+    def _tick(self):
+        progress = min(1.0, (time.perf_counter() - self.started) / self.duration)
+        if progress >= 1.0:
+            self.job = None
+            self.finish()
+        else:
+            self.on_frame(progress)
+            self.job = self.root.after(self.FRAME_MS, self._tick)
+
+    def finish(self):
+        # Jump to the end of the running animation and report it done
+        if not self.running:
+            return
+        on_frame, on_done = self.on_frame, self.on_done
+        self.cancel()
+        on_frame(1.0)
+        on_done()
+
+    def cancel(self):
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+            self.job = None
+        self.on_frame = None
+        self.on_done = None
 
 
 class DijkstraVisualizer:
+    # Labels shown in the strategy menu -> dijkstra.STRATEGIES keys
+    STRATEGIES = {"Dijkstra": 'dijkstra', "A*": 'astar', "ALT": 'alt', "Bidirectional": 'bidirectional'}
+    ANIMATION_DURATION = 1000  # Milliseconds per edge at speed 1.0
+    INSTANT_SPEED = 5.0  # From this speed on edges are not animated at all
+    FRAME_BUDGET = 10  # Default milliseconds of algorithm work per auto-play frame
+    RATE_INTERVAL = 0.5  # Seconds between steps per second readouts
+    NODE_RADIUS = 15
+    ZOOM_STEP = 1.2  # Zoom factor per mouse wheel notch
+    MIN_ZOOM, MAX_ZOOM = 0.001, 8.0
+    LABEL_ZOOM = 0.5  # Below this zoom labels and doubled up edges are left out
+    CLUSTER_ZOOM = 0.2  # Below this zoom nodes are drawn as clusters
+    CLUSTER_PIXELS = 40  # Rough on screen size of a cluster cell
+    MAX_VISIBLE_NODES = 3000  # More nodes than this in view are clustered too
+    EVENTS_PER_SECOND = 50  # Background solve events replayed per second at speed 1.0
+    GRAPH_FILE_TYPES = [("JSON Lines", "*.jsonl"), ("Binary graph", "*.dgb"),
+                        ("CSV edge list", "*.csv"), ("All files", "*")]
+
     def __init__(self, root):
         self.root = root
         self.root.title("Interactive Dijkstra's Algorithm Visualization")
         self.graph = Graph()
         self.create_widgets()
+        self.renderer = CanvasRenderer(self.canvas, self.root)
+        self.animation = AnimationScheduler(self.root)
         self.bind_canvas_actions()
+        # SolverWorker of a background solve, and the replay of its events:
+        # FrozenGraph index -> node, events taken off its queue but not yet
+        # shown, the distances and previous seen so far, replay credit
         self.dijkstra_thread = None
+        self.stream_job = None
+        self.stream_nodes = []
+        self.stream_source = None
+        self.stream_backlog = collections.deque()
+        self.stream_distances = {}
+        self.stream_previous = {}
+        self.stream_tree = None
+        self.stream_stale = False
+        self.stream_credit = 0.0
+        self.stream_last = 0.0
         self.algorithm = None
-        # Load the car image
-        self.car_image = Image.open("car.png")
-        self.car_image = self.car_image.resize((30, 30), Image.LANCZOS)
-        self.car_photo = ImageTk.PhotoImage(self.car_image)
+        # Full trees of past background runs, reused while the graph is
+        # unchanged
+        self.result_cache = ResultCache()
+        # Nodes and edge lines drawn differently from how they were created,
+        # which is all clear_response has to put back
+        self.painted_nodes = set()
+        self.painted_lines = set()
+        # Shortest path tree of the last run, repaired as edges are edited,
+        # or the source to build it from on the first edit
+        self.path_tree = None
+        self.path_source = None
+        self.shown_path = []
+        # Level of detail: edges drawn on top of an opposite edge, cluster
+        # items on screen and cached cluster cells per grid level
+        self.duplicate_edges = set()
+        self.cluster_items = []
+        self.clusters = {}
+        self.clusters_key = None
+        self.view_scheduled = False
+        self.pan_anchor = None
+        # Auto-play: pending frame, car position to draw at the end of the
+        # frame, and steps counted towards the next throughput readout
+        self.play_job = None
+        self.car_target = None
+        self.play_steps = 0
+        self.play_since = 0.0
+        # The car image is loaded the first time the car is shown
+        self.car_photo = None
+        self.car_photo_loaded = False
         self.car_sprite = None  # Will be used to display the car on the canvas
+        self.car_at = None  # Graph coordinates the car is drawn at
 
     def animate_car(self, start_x, start_y, end_x, end_y, animate=True):
-        if not animate:
+        if self.playing:
+            # Steps come too fast to animate, the car is drawn once per frame
+            self.car_target = (end_x, end_y)
+        elif not animate:
             # Instant move
-            if self.car_sprite:
-                self.canvas.coords(self.car_sprite, end_x, end_y)
-            else:
-                self.car_sprite = self.canvas.create_image(end_x, end_y, image=self.car_photo)
+            self.place_car(end_x, end_y)
             # Do not proceed automatically; wait for user input
         else:
-            # Animated movement
-            duration = 1000  # Duration in milliseconds
-            steps = int(duration / 20)  # Number of steps in the animation
-            delta_x = (end_x - start_x) / steps
-            delta_y = (end_y - start_y) / steps
-            self.animation_step = 0
-            self.animation_steps = steps
-            self.animation_delta_x = delta_x
-            self.animation_delta_y = delta_y
-            self.animation_start_x = start_x
-            self.animation_start_y = start_y
-            self.animation_end_callback = self.resume_algorithm  # Callback after animation
-
-            # Disable the Next Step button during animation
-            self.next_step_button.config(state=tk.DISABLED)
+            # Animated movement, shorter the faster the slider is set and
+            # skipped altogether past INSTANT_SPEED
+            speed = self.speed_slider.get()
+            duration = 0 if speed >= self.INSTANT_SPEED else self.ANIMATION_DURATION / speed
 
-            # Start the animation
-            self.move_car()
+            def on_frame(progress):
+                self.place_car(start_x + (end_x - start_x) * progress,
+                               start_y + (end_y - start_y) * progress)
+            self.animation.start(duration, on_frame, self.resume_algorithm)
 
-    def move_car(self):
-        if self.animation_step <= self.animation_steps:
-            x = self.animation_start_x + self.animation_delta_x * self.animation_step
-            y = self.animation_start_y + self.animation_delta_y * self.animation_step
-            if self.car_sprite:
-                self.canvas.coords(self.car_sprite, x, y)
-            else:
-                self.car_sprite = self.canvas.create_image(x, y, image=self.car_photo)
-            self.animation_step += 1
-            self.root.after(20, self.move_car)
+    def place_car(self, x, y):
+        if self.car_sprite:
+            # Zooming and panning move the car along with the scene, so the
+            # view maps its old position to where it is on screen now
+            old_x, old_y = self.renderer.to_screen(*self.car_at)
+            new_x, new_y = self.renderer.to_screen(x, y)
+            self.canvas.move(self.car_sprite, new_x - old_x, new_y - old_y)
         else:
-            # Animation complete
-            if self.animation_end_callback:
-                self.animation_end_callback()
+            self.car_sprite = self.draw_car(*self.renderer.to_screen(x, y))
+        self.car_at = (x, y)
+
+    def draw_car(self, x, y):
+        if not self.car_photo_loaded:
+            self.car_photo = load_car_photo()
+            self.car_photo_loaded = True
+        if self.car_photo is not None:
+            return self.canvas.create_image(x, y, image=self.car_photo, tags=('scene', 'car'))
+        # No image to show, draw a small car shape instead
+        outline = [(-15, 5), (-15, -3), (-8, -4), (-4, -10), (6, -10), (10, -4), (15, -3), (15, 5)]
+        points = [value for dx, dy in outline for value in (x + dx, y + dy)]
+        return self.canvas.create_polygon(points, fill='orange', outline='black', tags=('scene', 'car'))
 
     def resume_algorithm(self):
-        # Re-enable the Next Step button
-        self.next_step_button.config(state=tk.NORMAL)
         # Proceed to the next step automatically
         if self.algorithm:
             self.algorithm.step_forward()
@@ -84,10 +343,17 @@ class DijkstraVisualizer:
         # Speed control slider
         speed_label = tk.Label(control_frame, text="Algorithm Speed")
         speed_label.pack(pady=5)
-        self.speed_slider = Scale(control_frame, from_=0.1, to=2.0, orient=HORIZONTAL, resolution=0.1)
+        self.speed_slider = Scale(control_frame, from_=0.1, to=10.0, orient=HORIZONTAL, resolution=0.1)
         self.speed_slider.set(1.0)  # Default speed
         self.speed_slider.pack(pady=5)
 
+        # Search strategy selector
+        strategy_label = tk.Label(control_frame, text="Search Strategy")
+        strategy_label.pack(pady=5)
+        self.strategy_var = tk.StringVar(value="Dijkstra")
+        self.strategy_menu = tk.OptionMenu(control_frame, self.strategy_var, *self.STRATEGIES)
+        self.strategy_menu.pack(pady=5)
+
         self.mode_label = tk.Label(control_frame, text="Current Mode: None")
         self.mode_label.pack(pady=5)
 
@@ -112,6 +378,12 @@ class DijkstraVisualizer:
         self.reset_button = tk.Button(control_frame, text="Reset Graph", command=self.reset_graph)
         self.reset_button.pack(pady=5)
 
+        self.load_button = tk.Button(control_frame, text="Load Graph", command=self.load_graph)
+        self.load_button.pack(pady=5)
+
+        self.save_button = tk.Button(control_frame, text="Save Graph", command=self.save_graph)
+        self.save_button.pack(pady=5)
+
         self.status_label = tk.Label(control_frame, text="")
         self.status_label.pack(pady=20)
 
@@ -128,23 +400,207 @@ class DijkstraVisualizer:
         self.next_step_button = tk.Button(control_frame, text="Next Step", command=self.next_step)
         self.next_step_button.pack(pady=5)
 
+        self.previous_step_button = tk.Button(control_frame, text="Previous Step", command=self.previous_step)
+        self.previous_step_button.pack(pady=5)
+
+        self.play_button = tk.Button(control_frame, text="Play", command=self.toggle_play)
+        self.play_button.pack(pady=5)
+
+        # Milliseconds of algorithm work per frame while playing
+        budget_label = tk.Label(control_frame, text="Frame Budget (ms)")
+        budget_label.pack(pady=5)
+        self.budget_slider = Scale(control_frame, from_=1, to=50, orient=HORIZONTAL)
+        self.budget_slider.set(self.FRAME_BUDGET)
+        self.budget_slider.pack(pady=5)
+
+        self.rate_label = tk.Label(control_frame, text="")
+        self.rate_label.pack(pady=5)
+
+        # Time the next run and keep a timeline of it for export
+        self.trace_var = tk.BooleanVar(value=False)
+        self.trace_check = tk.Checkbutton(control_frame, text="Record Trace", variable=self.trace_var)
+        self.trace_check.pack(pady=5)
+
+        # Solve in a worker thread and replay its events at the set speed
+        self.background_var = tk.BooleanVar(value=False)
+        self.background_check = tk.Checkbutton(control_frame, text="Solve in Background",
+                                               variable=self.background_var)
+        self.background_check.pack(pady=5)
+        self.export_trace_button = tk.Button(control_frame, text="Export Trace", command=self.export_trace)
+        self.export_trace_button.pack(pady=5)
+        self.export_trace_button.config(state=tk.DISABLED)
+
         # Disable buttons until the algorithm is run
         self.next_step_button.config(state=tk.DISABLED)
+        self.previous_step_button.config(state=tk.DISABLED)
+        self.play_button.config(state=tk.DISABLED)
 
     def bind_canvas_actions(self):
         self.canvas.bind("<Button-1>", self.canvas_click)
+        # Mouse wheel zooms (Button-4/5 on X11), middle or right drag pans
+        self.canvas.bind("<MouseWheel>", self.zoom)
+        self.canvas.bind("<Button-4>", self.zoom)
+        self.canvas.bind("<Button-5>", self.zoom)
+        for button in (2, 3):
+            self.canvas.bind(f"<ButtonPress-{button}>", self.pan_start)
+            self.canvas.bind(f"<B{button}-Motion>", self.pan_move)
+
+    def zoom(self, event):
+        factor = self.ZOOM_STEP if event.num == 4 or event.delta > 0 else 1 / self.ZOOM_STEP
+        scale = min(self.MAX_ZOOM, max(self.MIN_ZOOM, self.renderer.scale * factor))
+        # Keep the point under the mouse where it is
+        x, y = self.renderer.to_world(event.x, event.y)
+        self.renderer.set_view(scale, x - event.x / scale, y - event.y / scale)
+        self.schedule_refresh()
+
+    def pan_start(self, event):
+        self.pan_anchor = (event.x, event.y)
+
+    def pan_move(self, event):
+        if self.pan_anchor is None:
+            return
+        renderer = self.renderer
+        dx, dy = event.x - self.pan_anchor[0], event.y - self.pan_anchor[1]
+        self.pan_anchor = (event.x, event.y)
+        renderer.set_view(renderer.scale, renderer.origin_x - dx / renderer.scale,
+                          renderer.origin_y - dy / renderer.scale)
+        self.schedule_refresh()
+
+    def fit_view(self):
+        # Zoom and pan so the whole graph is in view
+        if not self.graph.nodes:
+            return
+        xs = [node.x for node in self.graph.nodes.values()]
+        ys = [node.y for node in self.graph.nodes.values()]
+        width, height = self.canvas_size()
+        margin = self.NODE_RADIUS * 2
+        scale = min(width / (max(xs) - min(xs) + 2 * margin), height / (max(ys) - min(ys) + 2 * margin))
+        scale = min(1.0, max(self.MIN_ZOOM, scale))
+        self.renderer.set_view(scale, min(xs) - margin, min(ys) - margin)
+        self.schedule_refresh()
+
+    def canvas_size(self):
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        if width <= 1:  # Not mapped yet, use the requested size
+            width, height = int(self.canvas['width']), int(self.canvas['height'])
+        return width, height
+
+    def schedule_refresh(self):
+        # Zoom, pan and new items are redrawn together once the events
+        # waiting right now are handled
+        if not self.view_scheduled:
+            self.view_scheduled = True
+            self.root.after_idle(self.refresh_view)
+
+    def refresh_view(self):
+        # Draw what is in view at a level of detail that fits the zoom
+        self.view_scheduled = False
+        renderer = self.renderer
+        for item in self.cluster_items:
+            renderer.delete(item)
+        self.cluster_items = []
+        width, height = self.canvas_size()
+        x1, y1 = renderer.to_world(0, 0)
+        x2, y2 = renderer.to_world(width, height)
+        # Labels hang below the nodes, look a bit past the edges of the view
+        margin = self.NODE_RADIUS * 3
+        nodes = []
+        if renderer.scale >= self.CLUSTER_ZOOM:
+            nodes = self.graph.get_nodes_in_rect(x1 - margin, y1 - margin, x2 + margin, y2 + margin)
+        if renderer.scale < self.CLUSTER_ZOOM or len(nodes) > self.MAX_VISIBLE_NODES:
+            renderer.show(self.draw_clusters(x1, y1, x2, y2))
+            return
+
+        detail = renderer.scale >= self.LABEL_ZOOM
+        items = []
+        for edge in self.graph.get_edges_in_rect(x1, y1, x2, y2):
+            if detail:
+                items.extend(edge.graphics)
+            elif edge not in self.duplicate_edges:
+                items.append(edge.graphics[0])
+        for node in nodes:
+            items.extend(node.graphics if detail else node.graphics[:1])
+        renderer.show(items)
+        # Items drawn just now end up on top, put edges back underneath
+        self.canvas.tag_lower('edge')
+        self.canvas.tag_raise('car')
+
+    def draw_clusters(self, x1, y1, x2, y2):
+        # One circle per grid cell of about CLUSTER_PIXELS on screen, at the
+        # centre of the nodes in it and sized by how many there are
+        scale = self.renderer.scale
+        level = math.ceil(math.log2(self.CLUSTER_PIXELS / scale))
+        size = 2.0 ** level
+        for (cx, cy), (count, sum_x, sum_y) in self.cluster_cells(level).items():
+            if not (x1 - size <= cx * size <= x2 and y1 - size <= cy * size <= y2):
+                continue
+            x, y = sum_x / count, sum_y / count
+            radius = min(self.CLUSTER_PIXELS / 2, 3 + 2 * math.sqrt(count)) / scale
+            self.cluster_items.append(self.renderer.create(
+                'oval', (x - radius, y - radius, x + radius, y + radius),
+                tags=('cluster',), fill='lightblue', outline='blue'))
+            if count > 1:
+                self.cluster_items.append(self.renderer.create('text', (x, y), tags=('cluster',), text=str(count)))
+        return self.cluster_items
+
+    def cluster_cells(self, level):
+        # (cx, cy) -> [nodes, sum of x, sum of y] for cells of 2**level,
+        # counted once per level until nodes are added or the graph changes
+        key = (id(self.graph), len(self.graph.nodes))
+        if key != self.clusters_key:
+            self.clusters = {}
+            self.clusters_key = key
+        cells = self.clusters.get(level)
+        if cells is None:
+            cells = self.clusters[level] = {}
+            size = 2.0 ** level
+            for node in self.graph.nodes.values():
+                cell = cells.get((node.x // size, node.y // size))
+                if cell is None:
+                    cells[(node.x // size, node.y // size)] = [1, node.x, node.y]
+                else:
+                    cell[0] += 1
+                    cell[1] += node.x
+                    cell[2] += node.y
+        return cells
 
     def clear_response(self):
-        # Reset node colors and distances
-        for node in self.graph.nodes.values():
+        # Reset node colors and distances, only for what was drawn since the
+        # last reset so clearing a small search doesn't walk the whole graph.
+        # When that is most of it, a few tag wide calls beat one per item.
+        nodes = self.painted_nodes
+        for node in (self.graph.get_start_node(), self.graph.get_end_node()):
+            if node:
+                nodes.add(node)
+        for node in nodes:
             node.distance = float('inf')  # Reset distance to infinity
             node.visited = False  # Reset visited status if used
-            self.update_node_color(node)
-            self.update_node_distance(node)
+        if len(nodes) * 2 > len(self.graph.nodes):
+            all_nodes = self.graph.nodes.values()
+            self.renderer.configure_tag('node', [node.graphics[0] for node in all_nodes], fill='blue')
+            self.renderer.configure_tag('distance', [node.graphics[2] for node in all_nodes],
+                                        text=self.format_distance(float('inf')))
+            for node in (self.graph.get_start_node(), self.graph.get_end_node()):
+                if node:
+                    self.update_node_color(node)
+        else:
+            for node in nodes:
+                self.update_node_color(node)
 
         # Reset edge colors
-        for edge in self.graph.edges:
-            self.canvas.itemconfig(edge.graphics[0], fill='black')  # Default edge color
+        if len(self.painted_lines) * 2 > len(self.graph.edges):
+            self.renderer.configure_tag('edge', [edge.graphics[0] for edge in self.graph.drawn_edges()],
+                                        fill='black')
+        else:
+            for line in self.painted_lines:
+                self.renderer.configure(line, fill='black')
+        self.painted_nodes = set()
+        self.painted_lines = set()
+
+        self.animation.cancel()
+        self.stop_playback()
+        self.stop_background_run()
+        self.drop_path_tree()
 
         # Clear algorithm-specific data
         if self.algorithm:
@@ -155,12 +611,17 @@ class DijkstraVisualizer:
 
         # Disable the Clear Response button again
         self.clear_response_button.config(state=tk.DISABLED)
+        self.next_step_button.config(state=tk.DISABLED)
+        self.previous_step_button.config(state=tk.DISABLED)
+        self.play_button.config(state=tk.DISABLED)
 
         # Update the status label or any other UI elements
         self.status_label.config(text="Graph reset to initial state.")
 
 
     def canvas_click(self, event):
+        # The handlers below work in graph coordinates
+        event.x, event.y = self.renderer.to_world(event.x, event.y)
         if self.current_mode == 'add_node':
             self.create_node(event)
         elif self.current_mode == 'set_start':
@@ -180,9 +641,12 @@ class DijkstraVisualizer:
     def create_node(self, event):
         x, y = event.x, event.y
         node_id = len(self.graph.nodes)
+        while node_id in self.graph.nodes:  # Loaded graphs may use other ids
+            node_id += 1
         node = Node(node_id, x, y)
         self.graph.add_node(node)
         self.draw_node(node)
+        self.schedule_refresh()
 
     def draw_node(self, node):
         color = 'blue'
@@ -191,25 +655,24 @@ class DijkstraVisualizer:
             node.distance = 0
         elif node.node_type == 'end':
             color = 'red'
-        node_shape = self.canvas.create_oval(
-            node.x - 15, node.y - 15, node.x + 15, node.y + 15, fill=color
+        r = self.NODE_RADIUS
+        node_shape = self.renderer.create(
+            'oval', (node.x - r, node.y - r, node.x + r, node.y + r), tags=('node',), fill=color
         )
-        node_label = self.canvas.create_text(node.x, node.y, text=str(node.id))
+        node_label = self.renderer.create('text', (node.x, node.y), text=str(node.id))
 
         # Changes to the distance label
-        distance_label = self.canvas.create_text(
-            node.x, node.y + 25, text=self.format_distance(node.distance),
+        distance_label = self.renderer.create(
+            'text', (node.x, node.y + 25), tags=('distance',), text=self.format_distance(node.distance),
             fill='red', font=('Arial', 12, 'bold')
         )
         node.graphics = (node_shape, node_label, distance_label)
 
     def update_node_distance(self, node):
-        self.canvas.itemconfig(
-            node.graphics[2],
-            text=self.format_distance(node.distance),
-            fill='red',
-            font=('Arial', 12, 'bold')
-        )
+        # Color and font are set when the label is drawn, only the text changes.
+        # Every change to how a node looks ends up here.
+        self.painted_nodes.add(node)
+        self.renderer.configure(node.graphics[2], text=self.format_distance(node.distance))
 
     def format_distance(self, distance):
         return "∞" if distance == float('inf') else str(distance)
@@ -220,7 +683,7 @@ class DijkstraVisualizer:
         self.clear_selected_nodes()
 
     def select_start_node(self, event):
-        node = self.graph.get_node_at(event.x, event.y)
+        node = self.get_node_at(event.x, event.y)
         if node:
             self.graph.set_start_node(node)
             self.update_node_color(node)
@@ -233,7 +696,7 @@ class DijkstraVisualizer:
         self.clear_selected_nodes()
 
     def select_end_node(self, event):
-        node = self.graph.get_node_at(event.x, event.y)
+        node = self.get_node_at(event.x, event.y)
         if node:
             self.graph.set_end_node(node)
             self.update_node_color(node)
@@ -246,7 +709,7 @@ class DijkstraVisualizer:
             color = 'green'
         elif node.node_type == 'end':
             color = 'red'
-        self.canvas.itemconfig(node.graphics[0], fill=color)
+        self.renderer.configure(node.graphics[0], fill=color)
         self.update_node_distance(node)
 
     def draw_edge_mode(self):
@@ -255,7 +718,7 @@ class DijkstraVisualizer:
         self.selected_nodes = []
 
     def select_edge_nodes(self, event):
-        node = self.graph.get_node_at(event.x, event.y)
+        node = self.get_node_at(event.x, event.y)
         if node and node not in self.selected_nodes:
             self.selected_nodes.append(node)
             self.highlight_node(node, 'yellow')
@@ -282,9 +745,23 @@ class DijkstraVisualizer:
     def draw_edge(self, edge):
         x1, y1 = edge.source.x, edge.source.y
         x2, y2 = edge.destination.x, edge.destination.y
-        line = self.canvas.create_line(x1, y1, x2, y2, arrow=tk.LAST if edge.directed else tk.NONE)
-        weight_label = self.canvas.create_text((x1 + x2) / 2, (y1 + y2) / 2, text=str(edge.weight))
+        line = self.renderer.create('line', (x1, y1, x2, y2), tags=('edge',), fill='black',
+                                    arrow=tk.LAST if edge.directed else tk.NONE)
+        weight_label = self.renderer.create('text', ((x1 + x2) / 2, (y1 + y2) / 2), text=str(edge.weight))
         edge.graphics = (line, weight_label)
+        self.share_edge_graphics(edge)
+        # An edge drawn over one going the other way adds nothing when
+        # zoomed out
+        opposite = self.graph.edge_lookup.get((edge.destination, edge.source), ())
+        if any(getattr(other, 'graphics', None) for other in opposite if other not in self.graph.generated_edges):
+            self.duplicate_edges.add(edge)
+        self.schedule_refresh()
+
+    def share_edge_graphics(self, edge):
+        # The reverse of an undirected edge is drawn by the same canvas items
+        reverse_edge = self.graph.get_reverse_edge(edge)
+        if reverse_edge:
+            reverse_edge.graphics = edge.graphics
 
     def clear_selected_nodes(self):
         for node in self.selected_nodes:
@@ -292,11 +769,12 @@ class DijkstraVisualizer:
         self.selected_nodes = []
 
     def highlight_node(self, node, color):
-        self.canvas.itemconfig(node.graphics[0], fill=color)
+        self.renderer.configure(node.graphics[0], fill=color)
         self.update_node_distance(node)
 
     def highlight_edge(self, edge, color):
-        self.canvas.itemconfig(edge.graphics[0], fill=color)
+        self.painted_lines.add(edge.graphics[0])
+        self.renderer.configure(edge.graphics[0], fill=color)
 
     def edit_edge_mode(self):
         self.current_mode = 'edit_edge'
@@ -311,6 +789,8 @@ class DijkstraVisualizer:
             self.prompt_edit_edge(edge)
             # After editing, reset the edge color
             self.highlight_edge(edge, 'black')
+            if self.path_tree or self.path_source:
+                self.refresh_path_tree()
             self.mode_label.config(text="Current Mode: None")
             self.current_mode = None
         else:
@@ -318,41 +798,18 @@ class DijkstraVisualizer:
 
     def prompt_edit_edge(self, edge):
         weight = simpledialog.askfloat("Edge Weight", "Enter the new weight for the edge:", initialvalue=edge.weight, minvalue=0.0)
-        if weight is not None:
-            edge.weight = weight
-            self.canvas.itemconfig(edge.graphics[1], text=str(edge.weight))
         direction = messagebox.askyesno("Edge Direction", "Is the edge directed?")
-        edge.directed = direction
-        self.canvas.itemconfig(edge.graphics[0], arrow=tk.LAST if edge.directed else tk.NONE)
+        self.graph.update_edge(edge, weight=weight, directed=direction)
+        self.renderer.configure(edge.graphics[1], text=str(edge.weight))
+        self.share_edge_graphics(edge)
+        self.renderer.configure(edge.graphics[0], arrow=tk.LAST if edge.directed else tk.NONE)
 
     def get_edge_at(self, x, y):
-        tolerance = 5  # Adjust this value as needed
-        for edge in self.graph.edges:
-            x1, y1 = edge.source.x, edge.source.y
-            x2, y2 = edge.destination.x, edge.destination.y
-            # Compute the distance from the point to the edge
-            distance = self.point_to_segment_distance(x, y, x1, y1, x2, y2)
-            if distance <= tolerance:
-                return edge
-        return None
+        return self.graph.get_edge_at(x, y, 5 / self.renderer.scale)  # 5 pixels at any zoom
 
-    def point_to_segment_distance(self, px, py, x1, y1, x2, y2):
-        # Compute the distance from point (px, py) to the segment (x1, y1)-(x2, y2)
-        line_mag = math.hypot(x2 - x1, y2 - y1)
-        if line_mag < 1e-8:
-            return math.hypot(px - x1, py - y1)
-
-        u = ((px - x1) * (x2 - x1) + (py - y1) * (y2 - y1)) / (line_mag ** 2)
-        if u < 0 or u > 1:
-            # Closest point does not fall within the segment
-            dist1 = math.hypot(px - x1, py - y1)
-            dist2 = math.hypot(px - x2, py - y2)
-            return min(dist1, dist2)
-        else:
-            # Intersecting point is within the segment
-            ix = x1 + u * (x2 - x1)
-            iy = y1 + u * (y2 - y1)
-            return math.hypot(px - ix, py - iy)
+    def get_node_at(self, x, y):
+        # 20 pixels at any zoom, but never less than the drawn node
+        return self.graph.get_node_at(x, y, max(self.NODE_RADIUS, 20 / self.renderer.scale))
 
     def run_dijkstra(self):
         start_node = self.graph.get_start_node()
@@ -361,21 +818,273 @@ class DijkstraVisualizer:
             messagebox.showerror("Error", "Start or end node not defined.")
             return
         self.clear_response_button.config(state=tk.DISABLED)  # Disable before running
-        self.algorithm = DijkstraAlgorithm(self.graph, self)
+        self.stop_playback()
+        self.stop_background_run()
+        strategy = self.STRATEGIES[self.strategy_var.get()]
+        if self.background_var.get() and strategy != 'bidirectional':
+            if not self.show_cached_result(start_node, end_node):
+                self.start_background_run(start_node, end_node, strategy)
+            return
+        instrumentation = Instrumentation() if self.trace_var.get() else None
+        self.algorithm = DijkstraAlgorithm(self.graph, self, strategy, instrumentation)
+        self.export_trace_button.config(state=tk.NORMAL if instrumentation else tk.DISABLED)
         self.algorithm.speed = self.speed_slider.get()  # Get current speed
         self.algorithm.run(start_node, end_node)
         # Enable the Clear Response button after the algorithm finishes
         # Enable step buttons
         self.next_step_button.config(state=tk.NORMAL)
+        self.previous_step_button.config(state=tk.NORMAL)
+        self.play_button.config(state=tk.NORMAL)
         self.clear_response_button.config(state=tk.NORMAL)
+        if self.algorithm_finished():
+            self.play_button.config(state=tk.DISABLED)
 
 
+    def show_cached_result(self, start_node, end_node):
+        # Answer a query the graph hasn't changed since from the cache;
+        # False when it has to be solved
+        result = self.result_cache.lookup(self.graph, start_node, end_node)
+        if result is None:
+            return False
+        distances, previous, path = result
+        self.algorithm = None
+        self.export_trace_button.config(state=tk.DISABLED)
+        for button in (self.next_step_button, self.previous_step_button, self.play_button):
+            button.config(state=tk.DISABLED)
+        for node in path:
+            node.distance = distances[node]
+            self.update_node_distance(node)
+        # The path tree repairs its dicts on edits, so it gets copies
+        tree = self.result_cache.cached_tree(self.graph, start_node)
+        self.on_algorithm_complete(distances, previous, tree and (dict(tree[0]), dict(tree[1])))
+        stats = self.result_cache.stats()
+        self.status_label.config(text=f"Answered from the cache ({stats['hits']} hits, {stats['misses']} misses)")
+        return True
+
+    def start_background_run(self, start_node, end_node, strategy):
+        # Snapshot the graph and solve it in a SolverWorker; drain_events
+        # shows what it found, so the window stays responsive however long
+        # the search takes
+        self.algorithm = None
+        self.export_trace_button.config(state=tk.DISABLED)
+        for button in (self.next_step_button, self.previous_step_button, self.play_button):
+            button.config(state=tk.DISABLED)
+        frozen = self.graph.freeze()
+        self.stream_nodes = [self.graph.nodes[node_id] for node_id in frozen.node_ids]
+        self.stream_source = start_node
+        heuristic = None
+        if strategy in HEURISTICS:
+            estimate = HEURISTICS[strategy](self.graph, end_node)
+            heuristic = [estimate(node) for node in self.stream_nodes]
+        self.stream_distances = {start_node: 0}
+        self.stream_previous = {}
+        self.stream_tree = None
+        self.stream_stale = False
+        self.graph.add_listener(self.on_stream_edit)
+        start_node.distance = 0
+        self.update_node_distance(start_node)
+        self.dijkstra_thread = SolverWorker(frozen, frozen.index_of[start_node.id],
+                                            frozen.index_of[end_node.id], heuristic)
+        self.dijkstra_thread.start()
+        self.stream_credit = 0.0
+        self.stream_last = time.perf_counter()
+        self.status_label.config(text="Solving in the background...")
+        self.clear_response_button.config(state=tk.NORMAL)  # Also cancels the solve
+        self.stream_job = self.root.after(0, self.drain_events)
+
+    def stop_background_run(self):
+        if self.dijkstra_thread is None:
+            return
+        self.dijkstra_thread.cancel()
+        self.dijkstra_thread = None
+        if self.stream_job is not None:
+            self.root.after_cancel(self.stream_job)
+            self.stream_job = None
+        self.stream_backlog.clear()
+        self.graph.remove_listener(self.on_stream_edit)
+        self.car_target = None
+
+    def on_stream_edit(self, event, edge, old_weight=None):
+        # The worker's full tree no longer matches the graph
+        self.stream_stale = True
+
+    def drain_events(self):
+        # Show as many of the worker's events as the speed allows, within
+        # the frame budget, then draw once
+        self.stream_job = None
+        worker = self.dijkstra_thread
+        if worker is None:
+            return
+        now = time.perf_counter()
+        speed = self.speed_slider.get()
+        if speed >= self.INSTANT_SPEED:
+            allowed = math.inf
+        else:
+            # Credit builds up with time, capped so a stall doesn't end in
+            # a burst
+            self.stream_credit = min(self.stream_credit + (now - self.stream_last) * speed * self.EVENTS_PER_SECOND,
+                                     max(1.0, speed * self.EVENTS_PER_SECOND))
+            allowed = int(self.stream_credit)
+        self.stream_last = now
+        deadline = now + self.budget_slider.get() / 1000
+        backlog = self.stream_backlog
+        shown = 0
+        while shown < allowed:
+            if not backlog:
+                batch = worker.next_batch()
+                if batch is None:
+                    break
+                backlog.extend(batch)
+            if self.apply_event(backlog.popleft()):
+                return  # Finished, or failed
+            shown += 1
+            if time.perf_counter() >= deadline:
+                break
+        if allowed != math.inf:
+            self.stream_credit -= shown
+
+        if self.car_target:
+            self.place_car(*self.car_target)
+            self.car_target = None
+        self.renderer.flush()
+        self.stream_job = self.root.after(AnimationScheduler.FRAME_MS, self.drain_events)
+
+    def apply_event(self, event):
+        # Show one event of the background solve; True once it is over
+        kind = event[0]
+        if kind == SETTLE:
+            node = self.stream_nodes[event[1]]
+            node.distance = event[2]
+            if node.node_type == 'intermediate':
+                self.highlight_node(node, 'gray')
+            else:
+                self.update_node_color(node)
+            self.car_target = (node.x, node.y)
+        elif kind == RELAX:
+            node, parent = self.stream_nodes[event[1]], self.stream_nodes[event[2]]
+            node.distance = event[3]
+            self.stream_distances[node] = event[3]
+            self.stream_previous[node] = parent
+            edge = self.find_edge(parent, node)
+            if edge:  # Gone if it was made one way since the snapshot
+                self.highlight_edge(edge, 'blue')
+            self.highlight_node(node, 'orange')
+        elif kind == PATH:
+            self.status_label.config(text=f"Path found, distance {event[2]}")
+        elif kind == TREE:
+            self.stream_tree = event[1:]
+        elif kind == DONE:
+            self.finish_background_run(event[1])
+            return True
+        elif kind == FAILED:
+            self.stop_background_run()
+            messagebox.showerror("Error", f"The background solve failed: {event[1]}")
+            return True
+        return False
+
+    def finish_background_run(self, stats):
+        distances, previous = self.stream_distances, self.stream_previous
+        tree = None
+        if self.stream_tree and not self.stream_stale:
+            # Hand the worker's full tree to the ShortestPathTree rather
+            # than solving again here
+            nodes = self.stream_nodes
+            tree_distances, tree_previous = self.stream_tree
+            tree = ({nodes[i]: distance for i, distance in enumerate(tree_distances) if distance != math.inf},
+                    {nodes[i]: nodes[parent] for i, parent in enumerate(tree_previous) if parent >= 0})
+            self.result_cache.store(self.graph, self.stream_source, None, dict(tree[0]), dict(tree[1]), [])
+        self.stop_background_run()
+        self.on_algorithm_complete(distances, previous, tree)
+        self.status_label.config(text=self.format_stats(stats))
+
     def next_step(self):
+        self.stop_playback()
+        if self.animation.running:
+            # Skip the rest of the animation, which moves on to the next step
+            self.animation.finish()
+            return
         if self.algorithm:
             self.algorithm.step_forward()
+            if self.algorithm_finished():
+                self.next_step_button.config(state=tk.DISABLED)
+                self.play_button.config(state=tk.DISABLED)
+
+    def previous_step(self):
+        # A half finished edge animation belongs to the live state we leave
+        self.animation.cancel()
+        self.stop_playback()
+        if self.algorithm:
+            self.algorithm.step_backward()
+            # Stepping back always leaves something to step forward to
+            self.next_step_button.config(state=tk.NORMAL)
+            self.play_button.config(state=tk.NORMAL)
+
+    def algorithm_finished(self):
+        return self.algorithm.generator is None and self.algorithm.history.at_head()
+
+    @property
+    def playing(self):
+        return self.play_job is not None
+
+    def toggle_play(self):
+        if self.playing:
+            self.stop_playback()
+        elif self.algorithm and self.algorithm.running and not self.algorithm_finished():
+            # Drop any edge animation in progress, playback moves the car itself
+            self.animation.cancel()
+            self.algorithm.resume()
+            self.play_button.config(text="Pause")
+            self.play_steps = 0
+            self.play_since = time.perf_counter()
+            self.play_job = self.root.after(0, self.play_frame)
+
+    def stop_playback(self):
+        if self.play_job is not None:
+            self.root.after_cancel(self.play_job)
+            self.play_job = None
+        self.car_target = None
+        if self.algorithm:
+            self.algorithm.pause()
+        self.play_button.config(text="Play")
+
+    def play_frame(self):
+        # Advance as many steps as fit in the frame budget, then draw the
+        # result once and give the event loop the rest of the frame
+        algorithm = self.algorithm
+        if algorithm is None or algorithm.paused or not algorithm.running:
+            self.stop_playback()
+            return
+        deadline = time.perf_counter() + self.budget_slider.get() / 1000
+        steps = 0
+        while not self.algorithm_finished():
+            algorithm.step_forward()
+            steps += 1
+            if time.perf_counter() >= deadline:
+                break
+        self.play_steps += steps
+
+        now = time.perf_counter()
+        finished = self.algorithm_finished()
+        if finished or now - self.play_since >= self.RATE_INTERVAL:
+            rate = self.play_steps / max(now - self.play_since, 1e-9)
+            self.rate_label.config(text=f"{rate:,.0f} steps/s")
+            self.play_steps = 0
+            self.play_since = now
+
+        if finished:
+            self.stop_playback()
+            self.next_step_button.config(state=tk.DISABLED)
+            self.play_button.config(state=tk.DISABLED)
+            return
+        if self.car_target:
+            self.place_car(*self.car_target)
+            self.car_target = None
+        self.renderer.flush()
+        self.play_job = self.root.after(AnimationScheduler.FRAME_MS, self.play_frame)
 
 
     def highlight_shortest_path(self, previous, start_node, end_node):
+        self.shown_path = [end_node]
         node = end_node
         while node != start_node:
             prev_node = previous[node]
@@ -384,13 +1093,51 @@ class DijkstraVisualizer:
                 self.highlight_edge(edge, 'green')
             self.highlight_node(node, 'green')
             node = prev_node
+            self.shown_path.append(node)
+        self.shown_path.reverse()
         self.highlight_node(start_node, 'green')
 
+    def refresh_path_tree(self):
+        # Show the effect of an edge edit on the last run without rerunning it
+        tree = self.path_tree
+        if tree is None:
+            # First edit since the run: the tree is searched on the edited
+            # graph, so every distance shown that it moved needs updating
+            tree = self.path_tree = ShortestPathTree(self.graph, self.path_source)
+            self.path_source = None
+            tree.changed.update(node for node in self.painted_nodes if node.distance != tree.distance(node))
+        for node in tree.changed:
+            node.distance = tree.distance(node)
+            self.update_node_distance(node)
+        tree.changed.clear()
+
+        for source, destination in zip(self.shown_path, self.shown_path[1:]):
+            edge = self.find_edge(source, destination)
+            if edge:
+                self.highlight_edge(edge, 'black')
+        for node in self.shown_path:
+            self.update_node_color(node)
+
+        end_node = self.graph.get_end_node()
+        self.shown_path = tree.path_to(end_node)
+        for source, destination in zip(self.shown_path, self.shown_path[1:]):
+            self.highlight_edge(self.find_edge(source, destination), 'green')
+        for node in self.shown_path:
+            self.highlight_node(node, 'green')
+        if self.shown_path:
+            self.status_label.config(text=f"Shortest distance is now {tree.distance(end_node)}")
+        else:
+            self.status_label.config(text="No path after the edit.")
+
+    def drop_path_tree(self):
+        self.path_source = None
+        if self.path_tree:
+            self.path_tree.detach()
+            self.path_tree = None
+        self.shown_path = []
+
     def find_edge(self, source, destination):
-        for edge in self.graph.edges:
-            if edge.source == source and edge.destination == destination:
-                return edge
-        return None
+        return self.graph.find_edge(source, destination)
 
     def display_total_distance(self, distance):
         messagebox.showinfo("Shortest Path", f"The total distance is {distance}")
@@ -403,7 +1150,17 @@ class DijkstraVisualizer:
         self.clear_response_button.config(state=tk.NORMAL)
 
     def reset_graph(self):
+        self.animation.cancel()
+        self.stop_playback()
+        self.stop_background_run()
+        self.drop_path_tree()
         self.canvas.delete("all")
+        self.renderer.forget()
+        self.car_sprite = None
+        self.painted_nodes = set()
+        self.painted_lines = set()
+        self.duplicate_edges = set()
+        self.cluster_items = []
         self.graph = Graph()
         self.current_mode = None
         self.mode_label.config(text="Current Mode: None")
@@ -411,10 +1168,50 @@ class DijkstraVisualizer:
     def update(self):
         self.root.update()
 
-    def on_algorithm_complete(self, distances, previous):
-        self.highlight_shortest_path(previous, self.graph.get_start_node(), self.graph.get_end_node())
-        total_distance = distances[self.graph.get_end_node()]
-        self.display_total_distance(total_distance)
+    def load_graph(self):
+        path = filedialog.askopenfilename(filetypes=self.GRAPH_FILE_TYPES)
+        if not path:
+            return
+        try:
+            graph = graph_io.load_graph(path)
+        except (OSError, ValueError) as error:
+            messagebox.showerror("Error", f"Could not load the graph: {error}")
+            return
+        self.reset_graph()
+        self.graph = graph
+        for node in self.graph.nodes.values():
+            self.draw_node(node)
+        for edge in self.graph.drawn_edges():
+            self.draw_edge(edge)
+        self.fit_view()
+
+    def save_graph(self):
+        path = filedialog.asksaveasfilename(defaultextension=".jsonl", filetypes=self.GRAPH_FILE_TYPES)
+        if not path:
+            return
+        try:
+            graph_io.save_graph(self.graph, path)
+        except (OSError, TypeError, ValueError) as error:
+            messagebox.showerror("Error", f"Could not save the graph: {error}")
+
+    def on_algorithm_complete(self, distances, previous, tree=None):
+        # tree is an optional full (distances, previous) for the path tree
+        if self.algorithm:
+            self.status_label.config(text=self.format_stats(self.algorithm.stats, self.algorithm.instrumentation))
+        start_node, end_node = self.graph.get_start_node(), self.graph.get_end_node()
+        if end_node is not start_node and end_node not in previous:
+            self.show_no_path_message()
+        else:
+            self.drop_path_tree()
+            self.highlight_shortest_path(previous, start_node, end_node)
+            if tree is None:
+                # A run stopped at the end node only has part of the tree;
+                # the rest is searched on the first edge edit, not here
+                self.path_source = start_node
+            else:
+                self.path_tree = ShortestPathTree(self.graph, start_node, tree)
+            total_distance = distances[end_node]
+            self.display_total_distance(total_distance)
 
         # Remove the car sprite
         if self.car_sprite:
@@ -424,33 +1221,59 @@ class DijkstraVisualizer:
         # Disable step buttons
         self.next_step_button.config(state=tk.DISABLED)
 
-    def restore_state(self, distances, previous, visited, current_node, car_position):
-        # Reset the visualization
-        for node in self.graph.nodes.values():
+    def format_stats(self, stats, instrumentation=None):
+        lines = [f"Settled {stats.get('settled', 0)} nodes"]
+        if 'pushes' in stats:
+            lines.append(f"{stats['pushes']} pushes, {stats['pops']} pops ({stats['stale_pops']} stale)")
+            lines.append(f"{stats['relaxations']} relaxations, {stats['improvements']} improved")
+            lines.append(f"Peak queue {stats['peak_queue']}")
+        if instrumentation:
+            lines.append(f"Compute {instrumentation.compute_time * 1000:.1f} ms, "
+                         f"GUI {instrumentation.callback_time * 1000:.1f} ms in {instrumentation.callbacks} calls")
+        return "\n".join(lines)
+
+    def export_trace(self):
+        if not (self.algorithm and self.algorithm.instrumentation):
+            return
+        path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Chrome trace", "*.json")])
+        if not path:
+            return
+        try:
+            self.algorithm.instrumentation.export_trace(path)
+        except OSError as error:
+            messagebox.showerror("Error", f"Could not export the trace: {error}")
+
+    def restore_state(self, distances, previous, visited, current_node, car_position, changed=None):
+        # changed: nodes whose entries may differ from what is shown, None
+        # for all of them. Only those nodes and the edges ending at them are
+        # worked out, so a step costs what it changed; the renderer then only
+        # sends the items that actually differ from what is on screen. The
+        # colors are the ones the live run paints, so the nodes left alone
+        # still match: settled gray, reached orange, even for start and end.
+        incoming = self.graph.incoming
+        for node in (self.graph.nodes.values() if changed is None else changed):
             color = 'blue'
-            if node.node_type == 'start':
+            if node is current_node:
+                color = 'yellow'
+            elif node in visited:
+                color = 'gray'
+            elif node in distances:
+                color = 'orange'
+            elif node.node_type == 'start':
                 color = 'green'
             elif node.node_type == 'end':
                 color = 'red'
-            elif node in visited:
-                color = 'gray'
-            self.canvas.itemconfig(node.graphics[0], fill=color)
-            node.distance = distances[node]
+            self.renderer.configure(node.graphics[0], fill=color)
+            node.distance = distances.get(node, math.inf)
             self.update_node_distance(node)
 
-        # Reset edge colors
-        for edge in self.graph.edges:
-            self.canvas.itemconfig(edge.graphics[0], fill='black')
-
-        # Highlight current node
-        if current_node:
-            self.canvas.itemconfig(current_node.graphics[0], fill='yellow')
-
-        # Highlight edges in previous
-        for node, prev_node in previous.items():
-            edge = self.find_edge(prev_node, node)
-            if edge:
-                self.highlight_edge(edge, 'blue')
+            # Edges in previous are blue, the rest black. An undirected
+            # edge is shared with its twin, so it can be the neighbor's too.
+            parent = previous.get(node)
+            for edge in incoming.get(node, ()):
+                other = edge.source
+                in_tree = parent is other or (not edge.directed and previous.get(other) is node)
+                self.highlight_edge(edge, 'blue' if in_tree else 'black')
 
         # Restore the car's position
         if car_position:
@@ -460,5 +1283,3 @@ class DijkstraVisualizer:
                 self.canvas.delete(self.car_sprite)
                 self.car_sprite = None  # Ensure this line is present
 
-        self.root.update()
-
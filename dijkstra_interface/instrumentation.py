@@ -0,0 +1,91 @@
+# instrumentation.py
+
+import time
+
+# Counters DijkstraAlgorithm leaves in its stats dict after a run:
+#   pushes        entries put on the priority queue
+#   pops          entries taken off it
+#   stale_pops    entries skipped because their node was already settled
+#   relaxations   edges looked at from settled nodes
+#   improvements  relaxations that lowered a distance
+#   settled       nodes taken off the queue for good
+#   peak_queue    largest number of entries on the queue at once
+COUNTERS = ('pushes', 'pops', 'stale_pops', 'relaxations', 'improvements', 'settled', 'peak_queue')
+
+
+class Instrumentation:
+    # Timings for one DijkstraAlgorithm run, passed in as its
+    # instrumentation argument. Splits the time spent stepping the algorithm
+    # into time inside visualizer callbacks and the rest (compute), and with
+    # trace=True also keeps a timeline that export_trace writes in the Chrome
+    # trace event format (chrome://tracing, Perfetto). Runs without one make
+    # no clock calls at all.
+    def __init__(self, trace=True):
+        self.origin = time.perf_counter()
+        self.compute_time = 0.0
+        self.callback_time = 0.0
+        self.callbacks = 0
+        self.steps = 0
+        self.stats = {}  # The run's counters, linked in by DijkstraAlgorithm
+        self.events = [] if trace else None
+
+    def wrap(self, visualizer):
+        return _TimedVisualizer(visualizer, self)
+
+    def span(self, name, category, started, ended, **args):
+        # Record one finished slice of work; times are perf_counter values
+        if self.events is not None:
+            self.events.append({'name': name, 'cat': category, 'ph': 'X', 'pid': 1, 'tid': 1,
+                                'ts': (started - self.origin) * 1e6, 'dur': (ended - started) * 1e6,
+                                'args': args})
+
+    def step(self, name, started, ended, callback_time, queue_size=None):
+        # A stretch of algorithm work, callback_time of which was spent in
+        # visualizer callbacks
+        self.steps += 1
+        self.compute_time += (ended - started) - callback_time
+        if self.events is not None:
+            self.span(name, 'compute', started, ended)
+            counters = {key: self.stats.get(key, 0) for key in ('settled', 'pushes', 'stale_pops')}
+            if queue_size is not None:
+                counters['queue'] = queue_size
+            self.events.append({'name': 'counters', 'ph': 'C', 'pid': 1, 'tid': 1,
+                                'ts': (ended - self.origin) * 1e6, 'args': counters})
+
+    def summary(self):
+        summary = {key: self.stats.get(key, 0) for key in COUNTERS}
+        summary.update(steps=self.steps, compute_time=self.compute_time,
+                       callback_time=self.callback_time, callbacks=self.callbacks)
+        return summary
+
+    def export_trace(self, path):
+        if self.events is None:
+            raise ValueError("This run was instrumented without trace=True")
+        import json  # Only needed here, keeps it out of every solver import
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms', 'otherData': self.summary()}, f)
+
+
+class _TimedVisualizer:
+    # Stands in for the visualizer and times every method the algorithm
+    # calls on it
+    def __init__(self, visualizer, instrumentation):
+        self._visualizer = visualizer
+        self._instrumentation = instrumentation
+
+    def __getattr__(self, name):
+        attribute = getattr(self._visualizer, name)
+        if not callable(attribute):
+            return attribute
+        instrumentation = self._instrumentation
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return attribute(*args, **kwargs)
+            finally:
+                ended = time.perf_counter()
+                instrumentation.callback_time += ended - started
+                instrumentation.callbacks += 1
+                instrumentation.span(name, 'visualizer', started, ended)
+        return timed
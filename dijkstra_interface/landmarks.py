@@ -0,0 +1,242 @@
+# landmarks.py
+
+import heapq
+import math
+import random
+from array import array
+
+# Edits that left bounds looser, per node, before the tables are worth
+# recomputing with refresh()
+LOOSENED_SHARE = 1 / 16
+
+
+class Landmarks:
+    # Lower bounds for ALT (A*, landmarks, triangle inequality) searches.
+    # For a handful of landmark nodes L the distances from L to every node
+    # (forward) and from every node to L (backward) are stored, one array of
+    # floats per landmark indexed like nodes. The triangle inequality then
+    # gives, for any node v and target t:
+    #     d(v, t) >= d(L, t) - d(L, v)    and    d(v, t) >= d(v, L) - d(t, L)
+    # and the largest of these over all landmarks is a consistent A*
+    # heuristic that knows about the actual weights, not just geometry.
+    #
+    # The tables follow the graph's change notifications. A cheaper or new
+    # edge can shorten table distances, which would make the bounds too
+    # high, so the improvement is pushed through each table like a partial
+    # Dijkstra run. A dearer or removed edge needs nothing: bounds from the
+    # old, shorter distances are still lower bounds, only less tight.
+    # They are counted in loosened; once stale() says they add up, refresh()
+    # recomputes the tables.
+    def __init__(self, graph, count=8, selection='avoid', seed=0):
+        if selection not in SELECTIONS:
+            raise ValueError(f"Unknown landmark selection: {selection}")
+        self.graph = graph
+        self.nodes = list(graph.nodes.values())
+        self.index_of = {node: i for i, node in enumerate(self.nodes)}
+        self.landmarks = []
+        self.forward = []  # forward[k][i]: distance from landmark k to node i
+        self.backward = []  # backward[k][i]: distance from node i to landmark k
+        self.loosened = 0  # Edits since the last refresh that left bounds looser
+        SELECTIONS[selection](self, min(count, len(self.nodes)), random.Random(seed))
+        graph.add_listener(self.on_graph_change)
+
+    def detach(self):
+        # Stop following edits to the graph
+        self.graph.remove_listener(self.on_graph_change)
+
+    def add_landmark(self, node):
+        self.landmarks.append(node)
+        self.forward.append(self._distances(node, reverse=False)[0])
+        self.backward.append(self._distances(node, reverse=True)[0])
+
+    def refresh(self):
+        # Recompute every table from scratch with the same landmarks, making
+        # the bounds tight again after weights went up
+        self.nodes = list(self.graph.nodes.values())
+        self.index_of = {node: i for i, node in enumerate(self.nodes)}
+        self.forward = [self._distances(node, reverse=False)[0] for node in self.landmarks]
+        self.backward = [self._distances(node, reverse=True)[0] for node in self.landmarks]
+        self.loosened = 0
+
+    def stale(self):
+        return self.loosened > len(self.nodes) * LOOSENED_SHARE
+
+    def nbytes(self):
+        return sum(table.itemsize * len(table) for table in self.forward + self.backward)
+
+    def heuristic(self, end_node):
+        # Function giving a lower bound on the distance from a node to
+        # end_node, in the form euclidean_heuristic returns
+        target = self.index_of.get(end_node)
+        if target is None:
+            return lambda node: 0
+        index_of = self.index_of
+        columns = [(forward, backward, forward[target], backward[target])
+                   for forward, backward in zip(self.forward, self.backward)]
+
+        def heuristic(node):
+            i = index_of.get(node)
+            if i is None:
+                return 0
+            best = 0
+            # inf - inf gives nan, which never compares greater
+            for forward, backward, to_target, from_target in columns:
+                bound = to_target - forward[i]
+                if bound > best:
+                    best = bound
+                bound = backward[i] - from_target
+                if bound > best:
+                    best = bound
+            return best
+        return heuristic
+
+    def on_graph_change(self, event, edge, old_weight=None):
+        if event == 'add' or (event == 'weight' and edge.weight < old_weight):
+            self._decrease(edge)
+        elif event == 'remove' or event == 'weight':
+            self.loosened += 1
+
+    def _index(self, node):
+        i = self.index_of.get(node)
+        if i is None:
+            # Node added after the tables were built
+            i = self.index_of[node] = len(self.nodes)
+            self.nodes.append(node)
+            for table in self.forward + self.backward:
+                table.append(math.inf)
+        return i
+
+    def _decrease(self, edge):
+        source, destination = self._index(edge.source), self._index(edge.destination)
+        for forward, backward in zip(self.forward, self.backward):
+            new_distance = forward[source] + edge.weight
+            if new_distance < forward[destination]:
+                forward[destination] = new_distance
+                self._propagate(forward, [(new_distance, destination)], reverse=False)
+            new_distance = backward[destination] + edge.weight
+            if new_distance < backward[source]:
+                backward[source] = new_distance
+                self._propagate(backward, [(new_distance, source)], reverse=True)
+
+    def _distances(self, node, reverse):
+        # Distances from node, or to it over incoming edges when reverse,
+        # with the predecessor of each node towards node (-1 for none)
+        distances = array('d', [math.inf]) * len(self.nodes)
+        previous = array('i', [-1]) * len(self.nodes)
+        start = self.index_of[node]
+        distances[start] = 0
+        self._propagate(distances, [(0, start)], reverse, previous)
+        return distances, previous
+
+    def _propagate(self, distances, queue, reverse, previous=None):
+        nodes, index_of, incoming = self.nodes, self.index_of, self.graph.incoming
+        while queue:
+            current_distance, current = heapq.heappop(queue)
+            if current_distance > distances[current]:
+                continue
+            node = nodes[current]
+            for edge in (incoming.get(node, ()) if reverse else node.edges):
+                neighbor = index_of.get(edge.source if reverse else edge.destination)
+                if neighbor is None:
+                    continue  # Not indexed yet, its first edge event will add it
+                new_distance = current_distance + edge.weight
+                if new_distance < distances[neighbor]:
+                    distances[neighbor] = new_distance
+                    if previous is not None:
+                        previous[neighbor] = current
+                    heapq.heappush(queue, (new_distance, neighbor))
+
+    def _spread(self, i):
+        # How far node i is from its nearest landmark, both ways round
+        return min((forward[i] + backward[i] for forward, backward in zip(self.forward, self.backward)),
+                   default=math.inf)
+
+    def _farthest(self):
+        # Node farthest from the landmarks. Nodes no landmark connects with
+        # come last: in a connected graph there are none, otherwise they are
+        # mostly stray nodes that would make poor landmarks.
+        spreads = [self._spread(i) for i in range(len(self.nodes))]
+        best = max(range(len(spreads)), key=lambda i: (spreads[i] != math.inf, spreads[i]))
+        return best if spreads[best] > 0 else None
+
+
+def _select_farthest(landmarks, count, rng):
+    # Start from the node farthest from a random one, then keep adding the
+    # node farthest from the landmarks chosen so far
+    if not count:
+        return
+    distances, _ = landmarks._distances(rng.choice(landmarks.nodes), reverse=False)
+    first = max(range(len(distances)), key=lambda i: (distances[i] != math.inf, distances[i]))
+    landmarks.add_landmark(landmarks.nodes[first])
+    while len(landmarks.landmarks) < count:
+        best = landmarks._farthest()
+        if best is None:
+            break  # Every node is a landmark or as good as one
+        landmarks.add_landmark(landmarks.nodes[best])
+
+
+def _select_avoid(landmarks, count, rng):
+    # Goldberg and Harrelson's "avoid": grow a shortest path tree from a
+    # random root and weigh each node by how much the current bounds
+    # underestimate its distance from the root. Subtrees holding a landmark
+    # are already well covered and count as zero. Walking down from the
+    # root into the heaviest subtree ends at a leaf in the region the
+    # landmarks cover worst, which becomes the next landmark.
+    nodes = landmarks.nodes
+    while len(landmarks.landmarks) < count:
+        chosen = set(landmarks.landmarks)
+        root = rng.choice([node for node in nodes if node not in chosen])
+        distances, previous = landmarks._distances(root, reverse=False)
+        children = {}
+        order = []
+        for i in range(len(nodes)):
+            if previous[i] >= 0:
+                children.setdefault(previous[i], []).append(i)
+        stack = [landmarks.index_of[root]]
+        while stack:
+            i = stack.pop()
+            order.append(i)
+            stack.extend(children.get(i, ()))
+
+        size = {}
+        for i in reversed(order):
+            subtree = [size[child] for child in children.get(i, ())]
+            if nodes[i] in chosen or -1 in subtree:
+                size[i] = -1  # Marks a subtree holding a landmark
+            else:
+                size[i] = max(0.0, distances[i] - _bound_from(landmarks, root, i)) + sum(subtree)
+
+        i = landmarks.index_of[root]
+        if not any(size[child] > 0 for child in children.get(i, ())):
+            # Nothing left uncovered from this root, fall back to farthest
+            best = landmarks._farthest()
+            if best is None:
+                break
+            landmarks.add_landmark(nodes[best])
+            continue
+        while True:
+            heavier = [child for child in children.get(i, ()) if size[child] > 0]
+            if not heavier:
+                break
+            i = max(heavier, key=size.get)
+        landmarks.add_landmark(nodes[i])
+
+
+def _bound_from(landmarks, root, i):
+    # Lower bound on d(root, node i) from the tables built so far
+    r = landmarks.index_of[root]
+    best = 0
+    for forward, backward in zip(landmarks.forward, landmarks.backward):
+        bound = forward[i] - forward[r]
+        if bound > best:
+            best = bound
+        bound = backward[r] - backward[i]
+        if bound > best:
+            best = bound
+    return best
+
+
+SELECTIONS = {
+    'avoid': _select_avoid,
+    'farthest': _select_farthest,
+}
@@ -1,9 +1,11 @@
 # main.py
 
-import tkinter as tk
-from gui import DijkstraVisualizer
-
 def main():
+    # Imported here so processes that load this module without running it,
+    # such as multiprocessing workers, don't pay for Tk and the GUI
+    import tkinter as tk
+    from gui import DijkstraVisualizer
+
     root = tk.Tk()
     app = DijkstraVisualizer(root)
     root.mainloop()
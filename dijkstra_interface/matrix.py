@@ -0,0 +1,61 @@
+# matrix.py
+
+import multiprocessing
+
+from dijkstra import build_frozen_path, solve_frozen
+
+_worker_state = None  # (FrozenGraph, target indices, with paths) of this process
+
+
+def _init_worker(frozen, targets, with_paths):
+    # Runs once per worker, so the graph and targets are sent to each process
+    # only once instead of with every task
+    global _worker_state
+    _worker_state = (frozen, targets, with_paths)
+
+
+def _solve_row(source):
+    frozen, targets, with_paths = _worker_state
+    distances, previous, _ = solve_frozen(frozen, source)
+    row = [distances[target] for target in targets]
+    paths = [build_frozen_path(distances, previous, target) for target in targets] if with_paths else None
+    return row, paths
+
+
+def iter_distance_rows(graph, sources, targets, paths=False, processes=None):
+    # Yields (source, distances, paths) for each source node in order, where
+    # distances[j] is the distance to targets[j] (inf when unreachable) and
+    # paths[j] is the node list of that path, or None unless paths=True.
+    # Rows are produced one at a time so large matrices need not be held in
+    # memory. processes=1 runs everything in this process.
+    frozen = graph.freeze()
+    target_indices = [frozen.index_of[node.id] for node in targets]
+    tasks = (frozen.index_of[node.id] for node in sources)
+    initargs = (frozen, target_indices, paths)
+
+    def to_nodes(row_paths):
+        if row_paths is None:
+            return None
+        return [[graph.nodes[frozen.node_ids[i]] for i in path] for path in row_paths]
+
+    if processes == 1:
+        _init_worker(*initargs)
+        for source, task in zip(sources, tasks):
+            row, row_paths = _solve_row(task)
+            yield source, row, to_nodes(row_paths)
+        return
+
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=initargs) as pool:
+        for source, (row, row_paths) in zip(sources, pool.imap(_solve_row, tasks)):
+            yield source, row, to_nodes(row_paths)
+
+
+def distance_matrix(graph, sources, targets, paths=False, processes=None):
+    # Full matrix as a list of rows; path_matrix is None unless paths=True
+    matrix = []
+    path_matrix = [] if paths else None
+    for _, row, row_paths in iter_distance_rows(graph, sources, targets, paths, processes):
+        matrix.append(row)
+        if paths:
+            path_matrix.append(row_paths)
+    return matrix, path_matrix
@@ -0,0 +1,315 @@
+# parallel.py
+
+import math
+import multiprocessing
+import os
+from array import array
+from multiprocessing import shared_memory
+
+from dijkstra import build_frozen_path
+
+# Commands the coordinator hands the workers at the start of a phase
+START, PHASE, BUCKET, EXIT = range(4)
+# Per worker report slots, written at the end of every phase
+SENT, ACTIVE, NEXT_BUCKET = range(3)
+_REPORT_SIZE = 3
+
+
+class ParallelSolver:
+    # Delta-stepping over a FrozenGraph with the nodes split into one
+    # contiguous range per worker process. The adjacency arrays and the
+    # distance/previous arrays live in shared memory; each worker only ever
+    # writes the distances of its own nodes.
+    #
+    # Tentative distances are grouped in buckets of width delta and the
+    # lowest non-empty bucket is relaxed in phases until it stops changing,
+    # after which its nodes are final. Within a phase each worker relaxes
+    # the edges of its active nodes; improvements to its own nodes are
+    # applied at once, those to other workers' nodes go to a shared outbox
+    # for the owner to apply at the start of the next phase. Outboxes
+    # alternate between two halves by phase so a worker reading one never
+    # races the sender filling the next. Two barriers per phase: one after
+    # the coordinator sets the command, one after the workers report.
+    #
+    # Workers are started once and reused for every solve until close().
+    def __init__(self, frozen, workers=None):
+        self.frozen = frozen
+        n = len(frozen)
+        self.workers = max(1, min(workers or os.cpu_count() or 1, n or 1))
+        p = self.workers
+        self.chunk = -(-n // p) if n else 1  # Nodes per worker, the last one may have fewer
+        bounds = [min(i * self.chunk, n) for i in range(p + 1)]
+
+        # Room for messages from worker i to worker j: at most one per
+        # distinct target, so cross edges capped by the size of j's range
+        cross = [[0] * p for _ in range(p)]
+        offsets, targets = frozen.offsets, frozen.targets
+        for i in range(p):
+            row = cross[i]
+            for k in range(offsets[bounds[i]], offsets[bounds[i + 1]]):
+                owner = targets[k] // self.chunk
+                if owner != i:
+                    row[owner] += 1
+        box_starts = [0]
+        for i in range(p):
+            for j in range(p):
+                box_starts.append(box_starts[-1] + min(cross[i][j], bounds[j + 1] - bounds[j]))
+        box_total = box_starts[-1]
+
+        self.blocks = {}
+        self.views = []
+        layout = (
+            ('offsets', 'i', frozen.offsets), ('targets', 'i', frozen.targets),
+            ('weights', 'd', frozen.weights),
+            ('distances', 'd', n), ('previous', 'i', n),
+            ('control', 'd', 4),  # command, bucket, delta, source
+            ('reports', 'd', p * _REPORT_SIZE),
+            ('box_counts', 'i', 2 * p * p),
+            ('box_starts', 'i', array('i', box_starts)),
+            ('box_targets', 'i', 2 * box_total), ('box_distances', 'd', 2 * box_total),
+            ('box_parents', 'i', 2 * box_total),
+        )
+        try:
+            for name, code, data in layout:
+                self._share(name, code, data)
+        except BaseException:
+            self.close()
+            raise
+
+        self.barrier = multiprocessing.Barrier(p + 1)
+        names = {name: (block.name, code, count) for name, (block, code, count) in self.blocks.items()}
+        self.processes = [
+            multiprocessing.Process(target=_worker, args=(rank, p, n, self.chunk, names, self.barrier), daemon=True)
+            for rank in range(p)]
+        for process in self.processes:
+            process.start()
+        self.closed = False
+
+    def _share(self, name, code, data):
+        count = data if isinstance(data, int) else len(data)
+        size = max(1, array(code).itemsize * count)
+        block = shared_memory.SharedMemory(create=True, size=size)
+        self.blocks[name] = (block, code, count)
+        raw = block.buf[:array(code).itemsize * count]
+        view = raw.cast(code)
+        self.views.extend((raw, view))
+        if not isinstance(data, int):
+            view[:] = data if isinstance(data, array) else array(code, data)
+        setattr(self, name, view)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def solve(self, source, target=-1, delta=None):
+        # Returns (distances, previous, path) like dijkstra.solve_frozen. On
+        # ties previous may name a different but equally short predecessor.
+        if self.closed:
+            raise ValueError("Solver is closed")
+        if delta is None:
+            delta = self.default_delta()
+        control, reports = self.control, self.reports
+        control[1], control[2], control[3] = 0, delta, source
+        command = START
+        while True:
+            control[0] = command
+            self._wait()
+            if command == EXIT:
+                break
+            self._wait()
+            if any(reports[i * _REPORT_SIZE + SENT] or reports[i * _REPORT_SIZE + ACTIVE]
+                   for i in range(self.workers)):
+                command = PHASE  # Same bucket again with the nodes that changed
+                continue
+            bucket = int(control[1])
+            if command != START and target >= 0 and self.distances[target] < (bucket + 1) * delta:
+                break  # Target's bucket is settled
+            next_bucket = min(reports[i * _REPORT_SIZE + NEXT_BUCKET] for i in range(self.workers))
+            if next_bucket == math.inf:
+                break
+            control[1] = next_bucket
+            command = BUCKET
+
+        distances = array('d')
+        distances.frombytes(self.distances.cast('B'))
+        previous = array('i')
+        previous.frombytes(self.previous.cast('B'))
+        return distances, previous, build_frozen_path(distances, previous, target)
+
+    def default_delta(self):
+        # Mean edge weight times the mean out-degree. Every phase costs two
+        # barrier waits across processes, so buckets are wider than the one
+        # average edge solve_vectorized uses; the extra relaxations that
+        # brings are cheaper than the extra phases.
+        weights = self.frozen.weights
+        if not len(weights):
+            return 1.0
+        delta = sum(weights) / len(self.frozen)
+        return delta if delta > 0 else 1.0
+
+    def _wait(self):
+        try:
+            self.barrier.wait()
+        except multiprocessing.BrokenBarrierError:
+            self.close()
+            raise RuntimeError("A parallel solver worker failed") from None
+
+    def close(self):
+        if getattr(self, 'closed', True) is False:
+            self.closed = True
+            self.control[0] = EXIT
+            try:
+                self.barrier.wait(timeout=5)
+            except multiprocessing.BrokenBarrierError:
+                pass
+            for process in self.processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+        self.closed = True
+        for view in reversed(self.views):
+            view.release()
+        self.views = []
+        for block, _, _ in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks = {}
+
+
+def solve_parallel(frozen, source, target=-1, workers=None, delta=None):
+    # One-off search; keep a ParallelSolver around to reuse its workers
+    with ParallelSolver(frozen, workers) as solver:
+        return solver.solve(source, target, delta)
+
+
+def _worker(rank, p, n, chunk, names, barrier):
+    blocks = []
+    views = {}
+    exported = []
+    try:
+        for name, (block_name, code, count) in names.items():
+            block = shared_memory.SharedMemory(name=block_name)
+            blocks.append(block)
+            raw = block.buf[:array(code).itemsize * count]
+            views[name] = raw.cast(code)
+            exported.extend((raw, views[name]))
+        _work(rank, p, n, chunk, views, barrier)
+    except BaseException:
+        barrier.abort()  # Wakes the coordinator instead of leaving it waiting
+        raise
+    finally:
+        for view in reversed(exported):
+            view.release()
+        for block in blocks:
+            block.close()
+
+
+def _work(rank, p, n, chunk, views, barrier):
+    offsets, targets, weights = views['offsets'], views['targets'], views['weights']
+    distances, previous = views['distances'], views['previous']
+    control, reports = views['control'], views['reports']
+    box_counts, box_starts = views['box_counts'], views['box_starts']
+    box_targets, box_distances, box_parents = views['box_targets'], views['box_distances'], views['box_parents']
+    box_total = box_starts[p * p]
+    low, high = min(rank * chunk, n), min((rank + 1) * chunk, n)
+    report = rank * _REPORT_SIZE
+    inf = math.inf
+    phase = 0
+    buckets = {}  # Bucket index -> own nodes waiting in it
+    active = set()
+
+    while True:
+        barrier.wait()
+        command = control[0]
+        if command == EXIT:
+            return
+        bucket, delta = int(control[1]), control[2]
+        bucket_end = (bucket + 1) * delta
+        if command == START:
+            distances[low:high] = array('d', [inf]) * (high - low)
+            previous[low:high] = array('i', [-1]) * (high - low)
+            for k in range(2 * p * p):
+                if k % p == rank:
+                    box_counts[k] = 0
+            phase = 0
+            buckets = {}
+            active = set()
+            source = int(control[3])
+            if low <= source < high:
+                distances[source] = 0
+                buckets[0] = {source}
+        elif command == BUCKET:
+            active = buckets.pop(bucket, set())
+
+        if command != START:
+            # Apply what other workers sent in the previous phase
+            half = (phase - 1) % 2
+            for sender in range(p):
+                slot = half * p * p + sender * p + rank
+                count = box_counts[slot]
+                if not count:
+                    continue
+                start = half * box_total + box_starts[sender * p + rank]
+                for k in range(start, start + count):
+                    node, new_distance = box_targets[k], box_distances[k]
+                    old_distance = distances[node]
+                    if new_distance < old_distance:
+                        distances[node] = new_distance
+                        previous[node] = box_parents[k]
+                        _file(node, old_distance, new_distance, delta, bucket, bucket_end, buckets, active)
+                box_counts[slot] = 0
+
+            # Relax the active nodes; own improvements land straight away
+            remote = {}
+            changed = set()
+            for node in active:
+                current_distance = distances[node]
+                for k in range(offsets[node], offsets[node + 1]):
+                    neighbor = targets[k]
+                    new_distance = current_distance + weights[k]
+                    if low <= neighbor < high:
+                        old_distance = distances[neighbor]
+                        if new_distance < old_distance:
+                            distances[neighbor] = new_distance
+                            previous[neighbor] = node
+                            _file(neighbor, old_distance, new_distance, delta, bucket, bucket_end, buckets, changed)
+                    elif new_distance < remote.get(neighbor, (inf,))[0]:
+                        remote[neighbor] = (new_distance, node)
+            active = changed
+
+            # Post the rest to the owners' outboxes
+            half = phase % 2
+            counts = [0] * p
+            for neighbor, (new_distance, node) in remote.items():
+                owner = neighbor // chunk
+                k = half * box_total + box_starts[rank * p + owner] + counts[owner]
+                box_targets[k], box_distances[k], box_parents[k] = neighbor, new_distance, node
+                counts[owner] += 1
+            for owner in range(p):
+                box_counts[half * p * p + rank * p + owner] = counts[owner]
+            phase += 1
+            reports[report + SENT] = len(remote)
+        else:
+            reports[report + SENT] = 0
+
+        reports[report + ACTIVE] = len(active)
+        reports[report + NEXT_BUCKET] = min(buckets) if buckets else inf
+        barrier.wait()
+
+
+def _file(node, old_distance, new_distance, delta, bucket, bucket_end, buckets, active):
+    # Move a node whose distance dropped to the bucket it now belongs in;
+    # nodes landing in the bucket being relaxed become active instead
+    if old_distance != math.inf:
+        old_bucket = int(old_distance // delta)
+        if old_bucket != bucket and old_bucket in buckets:
+            waiting = buckets[old_bucket]
+            waiting.discard(node)
+            if not waiting:
+                del buckets[old_bucket]
+    if new_distance < bucket_end:
+        active.add(node)
+    else:
+        buckets.setdefault(int(new_distance // delta), set()).add(node)
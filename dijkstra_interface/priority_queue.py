@@ -0,0 +1,152 @@
+# priority_queue.py
+
+import heapq
+import itertools
+import math
+
+
+# All queues share the same small interface used by the solvers:
+#   update(item, priority)  insert item, or lower its priority if queued
+#   pop()                   remove and return (priority, item) with the
+#                           smallest priority
+#   len(queue)              number of queued items
+
+
+class LazyHeap:
+    # heapq with lazy deletion: lowering a priority pushes a new entry and
+    # the old one is skipped when it reaches the top. Cheap per operation,
+    # but the heap can hold one entry per relaxation.
+    def __init__(self):
+        self.heap = []
+        self.best = {}  # item -> priority of its live entry
+        self.counter = itertools.count()  # Tie-breaker, items aren't comparable
+
+    def __len__(self):
+        return len(self.best)
+
+    def update(self, item, priority):
+        if priority < self.best.get(item, math.inf):
+            self.best[item] = priority
+            heapq.heappush(self.heap, (priority, next(self.counter), item))
+
+    def pop(self):
+        while True:
+            priority, _, item = heapq.heappop(self.heap)
+            if self.best.get(item) == priority:
+                del self.best[item]
+                return priority, item
+
+
+class IndexedHeap:
+    # d-ary heap that knows where every item sits, so lowering a priority
+    # moves the existing entry instead of adding one. Its size never exceeds
+    # the number of distinct items.
+    def __init__(self, arity=4):
+        self.arity = arity
+        self.items = []
+        self.priorities = []
+        self.position = {}  # item -> index in items/priorities
+
+    def __len__(self):
+        return len(self.items)
+
+    def update(self, item, priority):
+        pos = self.position.get(item)
+        if pos is None:
+            self.items.append(item)
+            self.priorities.append(priority)
+            self._sift_up(len(self.items) - 1, item, priority)
+        elif priority < self.priorities[pos]:
+            self._sift_up(pos, item, priority)
+
+    def pop(self):
+        top_item, top_priority = self.items[0], self.priorities[0]
+        del self.position[top_item]
+        item, priority = self.items.pop(), self.priorities.pop()
+        if self.items:
+            self._sift_down(0, item, priority)
+        return top_priority, top_item
+
+    def _sift_up(self, pos, item, priority):
+        items, priorities, position, arity = self.items, self.priorities, self.position, self.arity
+        while pos > 0:
+            parent = (pos - 1) // arity
+            if priorities[parent] <= priority:
+                break
+            items[pos] = items[parent]
+            priorities[pos] = priorities[parent]
+            position[items[pos]] = pos
+            pos = parent
+        items[pos] = item
+        priorities[pos] = priority
+        position[item] = pos
+
+    def _sift_down(self, pos, item, priority):
+        items, priorities, position, arity = self.items, self.priorities, self.position, self.arity
+        size = len(items)
+        while True:
+            first = arity * pos + 1
+            if first >= size:
+                break
+            child = first
+            for i in range(first + 1, min(first + arity, size)):
+                if priorities[i] < priorities[child]:
+                    child = i
+            if priorities[child] >= priority:
+                break
+            items[pos] = items[child]
+            priorities[pos] = priorities[child]
+            position[items[pos]] = pos
+            pos = child
+        items[pos] = item
+        priorities[pos] = priority
+        position[item] = pos
+
+
+class BucketQueue:
+    # Dial's bucket queue for non-negative integer priorities. Each distinct
+    # priority has a bucket; since Dijkstra pops priorities in increasing
+    # order the minimum is found by moving a cursor forward.
+    def __init__(self):
+        self.buckets = {}  # priority -> {item: None}, an insertion ordered set
+        self.priority = {}  # item -> its current priority
+        self.cursor = 0
+
+    def __len__(self):
+        return len(self.priority)
+
+    def update(self, item, priority):
+        if priority != int(priority) or priority < 0:
+            raise ValueError("BucketQueue needs non-negative integer priorities")
+        old = self.priority.get(item)
+        if old is not None:
+            if priority >= old:
+                return
+            self._discard(item, old)
+        self.buckets.setdefault(priority, {})[item] = None
+        self.priority[item] = priority
+        if priority < self.cursor:
+            self.cursor = priority
+
+    def pop(self):
+        if self.cursor not in self.buckets:
+            # Skip the gap to the next non-empty bucket in one go
+            self.cursor = min(self.buckets)
+        bucket = self.buckets[self.cursor]
+        item = next(iter(bucket))
+        self._discard(item, self.cursor)
+        del self.priority[item]
+        return self.cursor, item
+
+    def _discard(self, item, priority):
+        bucket = self.buckets[priority]
+        del bucket[item]
+        if not bucket:
+            del self.buckets[priority]
+
+
+QUEUES = {
+    'heap': LazyHeap,
+    'indexed': IndexedHeap,
+    'bucket': BucketQueue,
+}
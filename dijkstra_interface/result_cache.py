@@ -0,0 +1,125 @@
+# result_cache.py
+
+import collections
+import sys
+import weakref
+
+from dijkstra import build_path, solve
+
+FLOAT_SIZE = sys.getsizeof(1.0)
+
+
+class ResultCache:
+    # Least recently used cache of search results for one graph at a time,
+    # keyed on (source id, target id, graph version). Full shortest path
+    # trees are stored with a target of None and answer any target from
+    # their source. Any change to the graph bumps Graph.version, so the
+    # first lookup after an edit (or with a different graph) drops every
+    # entry instead of letting stale results sit in memory.
+    #
+    # Entries are evicted oldest first once there are more than max_entries
+    # or their estimated size passes max_bytes. Results are shared with the
+    # cache, so treat the returned dicts and lists as read-only.
+    def __init__(self, max_entries=128, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()  # key -> (distances, previous, path, size)
+        self.bytes = 0
+        self.graph = None  # weakref to the graph the entries belong to
+        self.version = None
+        self.hits = 0
+        self.tree_hits = 0  # Hits answered from a cached tree of the source
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def solve(self, graph, source, target=None, strategy='dijkstra', stats=None):
+        # dijkstra.solve with the cache in front; target None asks for the
+        # full tree from source. stats is only filled on a miss.
+        result = self.lookup(graph, source, target)
+        if result is None:
+            result = solve(graph, source, target, strategy, stats)
+            self.store(graph, source, target, *result)
+        return result
+
+    def distance(self, graph, source, target):
+        distances, _, path = self.solve(graph, source, target)
+        return distances[target] if path else float('inf')
+
+    def path(self, graph, source, target):
+        return self.solve(graph, source, target)[2]
+
+    def tree(self, graph, source):
+        distances, previous, _ = self.solve(graph, source)
+        return distances, previous
+
+    def lookup(self, graph, source, target=None):
+        # Cached (distances, previous, path), or None
+        self._check(graph)
+        key = (source.id, None if target is None else target.id, self.version)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[:3]
+        if target is not None:
+            tree_key = (source.id, None, self.version)
+            entry = self.entries.get(tree_key)
+            if entry is not None:
+                self.entries.move_to_end(tree_key)
+                self.hits += 1
+                self.tree_hits += 1
+                distances, previous, _, _ = entry
+                path = build_path(previous, source, target) if target in distances else []
+                return distances, previous, path
+        self.misses += 1
+        return None
+
+    def cached_tree(self, graph, source):
+        # Full tree from source if one is cached, without counting a lookup
+        self._check(graph)
+        entry = self.entries.get((source.id, None, self.version))
+        return None if entry is None else entry[:2]
+
+    def store(self, graph, source, target, distances, previous, path):
+        self._check(graph)
+        size = (sys.getsizeof(distances) + sys.getsizeof(previous) + sys.getsizeof(path)
+                + FLOAT_SIZE * len(distances))
+        if size > self.max_bytes or self.max_entries <= 0:
+            return  # Would evict everything else and still not fit
+        key = (source.id, None if target is None else target.id, self.version)
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old[3]
+        self.entries[key] = (distances, previous, path, size)
+        self.bytes += size
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, _, _, evicted_size) = self.entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'tree_hits': self.tree_hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+    def _check(self, graph):
+        # Drop everything once the graph changed or another one is used
+        if self.graph is None or self.graph() is not graph or self.version != graph.version:
+            if self.entries:
+                self.invalidations += 1
+                self.clear()
+            self.graph = weakref.ref(graph)
+            self.version = graph.version
@@ -0,0 +1,329 @@
+# server.py
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import math
+import os
+import signal
+import sys
+import time
+
+from dijkstra import SearchWorkspace, build_frozen_path, solve_frozen
+from graph_io import load_graph
+
+# Newline-delimited JSON-RPC 2.0 over a Unix socket or TCP. Each line is a
+# request object or a batch (array of them); responses come back one line
+# each, in the order they finish, so clients can pipeline and match on id.
+#
+#   {"jsonrpc": "2.0", "id": 1, "method": "distance", "params": {"source": 0, "target": 5}}
+#   {"jsonrpc": "2.0", "id": 1, "result": {"distance": 12.0, "latency_ms": 0.41}}
+#
+# Methods (params by name or position):
+#   distance(source, target)                -> {distance}
+#   path(source, target)                    -> {distance, path}
+#   matrix(sources, targets, paths=false)   -> {distances, paths}
+#   stats()                                 -> request counts and recent latencies
+# Unreachable distances are null. Every result carries latency_ms, the time
+# from reading the request until its result is ready, before the response
+# is serialized and written.
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+MAX_PIPELINE = 256  # Requests a connection may have in flight before reading stops
+LATENCY_WINDOW = 10000  # Recent latencies kept for the percentiles in stats
+LINE_LIMIT = 16 * 1024 * 1024  # Longest request line accepted, in bytes
+
+_worker_frozen = None  # FrozenGraph of this worker process
+_worker_workspace = None  # SearchWorkspace reused by every query of this worker
+
+
+def _init_worker(frozen):
+    # Runs once per worker, so the graph is sent to each process only once
+    global _worker_frozen, _worker_workspace
+    _worker_frozen = frozen
+    _worker_workspace = SearchWorkspace(len(frozen))
+
+
+def _ping():
+    return os.getpid()
+
+
+def _solve_targets(source, targets, with_paths):
+    # One search from source answers every target asked for. A single
+    # target can stop as soon as it is settled; otherwise the whole tree is
+    # needed anyway. Returns distances (None when unreachable) and paths as
+    # node ids, in the order of targets.
+    frozen = _worker_frozen
+    distances, previous, _ = solve_frozen(frozen, source, targets[0] if len(targets) == 1 else -1,
+                                          workspace=_worker_workspace)
+    row = [distances[target] if distances[target] != math.inf else None for target in targets]
+    if not with_paths:
+        return row, None
+    node_ids = frozen.node_ids
+    paths = [[node_ids[i] for i in build_frozen_path(distances, previous, target)] for target in targets]
+    return row, paths
+
+
+class RequestError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class QueryServer:
+    # Answers queries on one loaded graph from a pool of worker processes
+    # that are started, handed the frozen graph and warmed up before the
+    # first connection. Queries from the same source that arrive in the same
+    # event loop pass, from any connection, share a single search.
+    def __init__(self, graph, workers=None):
+        self.frozen = graph.freeze()
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = None
+        self.pending = {}  # Source index -> [(target indices, with paths, future)]
+        self.flush_scheduled = False
+        self.requests = 0
+        self.errors = 0
+        self.solves = 0
+        self.coalesced = 0  # Queries answered by a search started for another
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.started = time.time()
+
+    async def start(self):
+        self.pool = concurrent.futures.ProcessPoolExecutor(
+            self.workers, initializer=_init_worker, initargs=(self.frozen,))
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, _ping) for _ in range(self.workers)))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    async def serve(self, socket_path=None, host='127.0.0.1', port=8765):
+        try:
+            # Shut the pool down cleanly when stopped by a service manager
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        except (NotImplementedError, AttributeError):
+            pass  # No signal handlers for event loops on Windows
+        await self.start()
+        try:
+            if socket_path:
+                server = await asyncio.start_unix_server(self.handle_connection, socket_path, limit=LINE_LIMIT)
+                where = socket_path
+            else:
+                server = await asyncio.start_server(self.handle_connection, host, port, limit=LINE_LIMIT)
+                where = f'{host}:{port}'
+            print(f"Serving {len(self.frozen)} nodes on {where} with {self.workers} workers", flush=True)
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+
+    async def handle_connection(self, reader, writer):
+        slots = asyncio.Semaphore(MAX_PIPELINE)
+        tasks = set()
+
+        async def answer(line, received):
+            try:
+                response = await self.handle_line(line, received)
+                if response is not None:
+                    writer.write(response.encode() + b'\n')
+                    await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                slots.release()
+
+        try:
+            while True:
+                await slots.acquire()
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, ValueError):  # ValueError: line over LINE_LIMIT
+                    break
+                if not line:
+                    break
+                task = asyncio.create_task(answer(line, time.perf_counter()))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        finally:
+            writer.close()
+
+    async def handle_line(self, line, received):
+        if not line.strip():
+            return None
+        try:
+            message = json.loads(line)
+        except ValueError:
+            self.errors += 1
+            return json.dumps(_error(None, PARSE_ERROR, "Parse error"))
+        if isinstance(message, list):
+            if not message:
+                return json.dumps(_error(None, INVALID_REQUEST, "Empty batch"))
+            responses = await asyncio.gather(*(self.handle_request(item, received) for item in message))
+            responses = [response for response in responses if response is not None]
+            return json.dumps(responses) if responses else None
+        response = await self.handle_request(message, received)
+        return None if response is None else json.dumps(response)
+
+    async def handle_request(self, message, received):
+        if not isinstance(message, dict) or message.get('jsonrpc') != '2.0' or not isinstance(message.get('method'), str):
+            self.errors += 1
+            return _error(message.get('id') if isinstance(message, dict) else None, INVALID_REQUEST, "Invalid request")
+        request_id = message.get('id')
+        self.requests += 1
+        try:
+            result = await self.call(message['method'], message.get('params', {}))
+        except RequestError as error:
+            self.errors += 1
+            response = _error(request_id, error.code, str(error))
+        except Exception as error:
+            self.errors += 1
+            response = _error(request_id, INTERNAL_ERROR, f"{type(error).__name__}: {error}")
+        else:
+            latency = (time.perf_counter() - received) * 1000
+            self.latencies.append(latency)
+            result['latency_ms'] = round(latency, 3)
+            response = {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+        # Requests without an id are notifications and get no response
+        return response if 'id' in message else None
+
+    async def call(self, method, params):
+        if method == 'distance':
+            source, target = _params(params, ('source', 'target'))
+            row, _ = await self.query(self.index(source), [self.index(target)], False)
+            return {'distance': row[0]}
+        if method == 'path':
+            source, target = _params(params, ('source', 'target'))
+            row, paths = await self.query(self.index(source), [self.index(target)], True)
+            return {'distance': row[0], 'path': paths[0]}
+        if method == 'matrix':
+            sources, targets, with_paths = _params(params, ('sources', 'targets', 'paths'), {'paths': False})
+            if not isinstance(sources, list) or not isinstance(targets, list):
+                raise RequestError(INVALID_PARAMS, "sources and targets must be lists")
+            target_indices = [self.index(target) for target in targets]
+            rows = await asyncio.gather(*(self.query(self.index(source), target_indices, bool(with_paths))
+                                          for source in sources))
+            return {'distances': [row for row, _ in rows],
+                    'paths': [paths for _, paths in rows] if with_paths else None}
+        if method == 'stats':
+            return self.stats()
+        raise RequestError(METHOD_NOT_FOUND, f"Unknown method {method!r}")
+
+    def index(self, node_id):
+        try:
+            return self.frozen.index_of[node_id]
+        except (KeyError, TypeError):
+            raise RequestError(INVALID_PARAMS, f"Unknown node {node_id!r}") from None
+
+    def query(self, source, targets, with_paths):
+        # Queue the query for the next flush, which runs one search per
+        # source for everything asked of it since the last one
+        future = asyncio.get_running_loop().create_future()
+        self.pending.setdefault(source, []).append((targets, with_paths, future))
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+        return future
+
+    def flush(self):
+        self.flush_scheduled = False
+        pending, self.pending = self.pending, {}
+        loop = asyncio.get_running_loop()
+        for source, queries in pending.items():
+            targets = sorted({target for query_targets, _, _ in queries for target in query_targets})
+            with_paths = any(query_with_paths for _, query_with_paths, _ in queries)
+            self.solves += 1
+            self.coalesced += len(queries) - 1
+            work = loop.run_in_executor(self.pool, _solve_targets, source, targets, with_paths)
+            work.add_done_callback(lambda work, targets=targets, queries=queries: _resolve(work, targets, queries))
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(fraction):
+            return round(latencies[min(len(latencies) - 1, int(fraction * len(latencies)))], 3) if latencies else None
+
+        return {
+            'nodes': len(self.frozen),
+            'workers': self.workers,
+            'uptime': round(time.time() - self.started, 3),
+            'requests': self.requests,
+            'errors': self.errors,
+            'solves': self.solves,
+            'coalesced': self.coalesced,
+            'recent': {
+                'mean': round(sum(latencies) / len(latencies), 3) if latencies else None,
+                'p50': percentile(0.5),
+                'p99': percentile(0.99),
+                'max': round(latencies[-1], 3) if latencies else None,
+            },
+        }
+
+
+def _resolve(work, targets, queries):
+    # Hand each query the part of a shared search it asked for
+    if work.cancelled():
+        for _, _, future in queries:
+            future.cancel()
+        return
+    error = work.exception()
+    if error is None:
+        row, paths = work.result()
+        position = {target: i for i, target in enumerate(targets)}
+    for query_targets, with_paths, future in queries:
+        if future.done():
+            continue
+        if error is not None:
+            future.set_exception(error)
+            continue
+        columns = [position[target] for target in query_targets]
+        future.set_result(([row[i] for i in columns], [paths[i] for i in columns] if with_paths else None))
+
+
+def _params(params, names, defaults=None):
+    # Positional or named params as a tuple in the order of names
+    defaults = defaults or {}
+    if isinstance(params, list):
+        values = dict(zip(names, params))
+    elif isinstance(params, dict):
+        values = params
+    else:
+        raise RequestError(INVALID_PARAMS, "params must be an object or an array")
+    try:
+        return tuple(values[name] if name in values else defaults[name] for name in names)
+    except KeyError as error:
+        raise RequestError(INVALID_PARAMS, f"Missing parameter {error.args[0]!r}") from None
+
+
+def _error(request_id, code, message):
+    return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve shortest path queries on a graph over JSON-RPC.")
+    parser.add_argument('graph', help="graph file, in any format graph_io.load_graph reads")
+    parser.add_argument('--socket', help="listen on this Unix socket instead of TCP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, help="solver processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    server = QueryServer(load_graph(args.graph), args.workers)
+    try:
+        asyncio.run(server.serve(args.socket, args.host, args.port))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
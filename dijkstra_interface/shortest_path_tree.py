@@ -0,0 +1,123 @@
+# shortest_path_tree.py
+
+import heapq
+import itertools
+import math
+
+from dijkstra import build_path, solve
+
+
+class ShortestPathTree:
+    # Shortest path tree from one source that stays correct while the graph
+    # is edited. It listens to the graph's change notifications and repairs
+    # only the part of the tree an edit can affect:
+    #   - a cheaper or new edge can only lower distances, so the improvement
+    #     is pushed forward from its destination like a partial Dijkstra run
+    #   - a dearer or removed tree edge invalidates the subtree hanging from
+    #     it; those nodes are re-seeded from their unaffected in-neighbours
+    #     and settled again
+    # Edges outside the tree that get dearer need no work at all.
+    def __init__(self, graph, source, tree=None):
+        # tree is an already computed (distances, previous) pair from source
+        # over the current graph, taken over instead of solving again
+        self.graph = graph
+        self.source = source
+        if tree is None:
+            self.distances, self.previous, _ = solve(graph, source)
+        else:
+            self.distances, self.previous = tree
+        self.children = {}  # Node -> nodes whose previous it is
+        for node, parent in self.previous.items():
+            self.children.setdefault(parent, set()).add(node)
+        # Nodes whose distance changed since the caller last cleared this
+        self.changed = set()
+        self.counter = itertools.count()
+        graph.add_listener(self.on_graph_change)
+
+    def detach(self):
+        # Stop following edits to the graph
+        self.graph.remove_listener(self.on_graph_change)
+
+    def distance(self, node):
+        return self.distances.get(node, math.inf)
+
+    def path_to(self, node):
+        if node not in self.distances:
+            return []
+        return build_path(self.previous, self.source, node)
+
+    def on_graph_change(self, event, edge, old_weight=None):
+        if event == 'add' or (event == 'weight' and edge.weight < old_weight):
+            self._decrease(edge)
+        elif event == 'remove' or (event == 'weight' and edge.weight > old_weight):
+            self._increase(edge.source, edge.destination)
+
+    def _set_previous(self, node, parent):
+        old_parent = self.previous.get(node)
+        if old_parent is not None:
+            self.children[old_parent].discard(node)
+        if parent is None:
+            self.previous.pop(node, None)
+        else:
+            self.previous[node] = parent
+            self.children.setdefault(parent, set()).add(node)
+
+    def _decrease(self, edge):
+        new_distance = self.distance(edge.source) + edge.weight
+        node = edge.destination
+        if new_distance < self.distance(node):
+            self.distances[node] = new_distance
+            self._set_previous(node, edge.source)
+            self.changed.add(node)
+            self._propagate([(new_distance, next(self.counter), node)])
+
+    def _increase(self, source, destination):
+        if self.previous.get(destination) is not source:
+            return  # Not a tree edge, no distance depends on it
+        edge = self.graph.find_edge(source, destination)
+        if edge is not None and self.distances[source] + edge.weight == self.distances[destination]:
+            return  # A parallel edge still gives the same distance
+
+        affected = []
+        stack = [destination]
+        while stack:
+            node = stack.pop()
+            affected.append(node)
+            stack.extend(self.children.get(node, ()))
+        affected_set = set(affected)
+        for node in affected:
+            del self.distances[node]
+            self._set_previous(node, None)
+        self.changed.update(affected)
+
+        # Best way into each affected node from outside the subtree
+        queue = []
+        for node in affected:
+            best, parent = math.inf, None
+            for incoming_edge in self.graph.incoming.get(node, ()):
+                neighbor = incoming_edge.source
+                if neighbor in affected_set:
+                    continue
+                distance = self.distance(neighbor) + incoming_edge.weight
+                if distance < best:
+                    best, parent = distance, neighbor
+            if parent is not None:
+                self.distances[node] = best
+                self._set_previous(node, parent)
+                queue.append((best, next(self.counter), node))
+        heapq.heapify(queue)
+        self._propagate(queue)
+
+    def _propagate(self, queue):
+        while queue:
+            current_distance, _, current_node = heapq.heappop(queue)
+            if current_distance > self.distances.get(current_node, math.inf):
+                continue
+            for edge in current_node.edges:
+                neighbor = edge.destination
+                new_distance = current_distance + edge.weight
+                if new_distance < self.distance(neighbor):
+                    self.distances[neighbor] = new_distance
+                    self._set_previous(neighbor, current_node)
+                    self.changed.add(neighbor)
+                    heapq.heappush(queue, (new_distance, next(self.counter), neighbor))
@@ -0,0 +1,64 @@
+# solver_worker.py
+
+import queue
+import threading
+
+from dijkstra import TREE, search_events
+
+# Events the worker adds to those of dijkstra.search_events, which with
+# with_tree also sends (TREE, distances, previous) as FrozenGraph arrays:
+#   (FAILED, message)             the search raised; nothing else follows
+FAILED = TREE + 1
+
+
+class SolverWorker(threading.Thread):
+    # Runs a search over a FrozenGraph snapshot in a daemon thread and puts
+    # its events on a bounded queue, in batches so the queue isn't locked
+    # once per event. A full queue makes the search wait for the reader, so
+    # memory stays bounded however far ahead the search is. The snapshot
+    # means the graph can be edited meanwhile without racing the search.
+    BATCH_SIZE = 512
+    MAX_BATCHES = 64
+
+    def __init__(self, frozen, source, target=-1, heuristic=None, with_tree=True):
+        super().__init__(daemon=True)
+        self.frozen = frozen
+        self.source = source
+        self.target = target
+        self.heuristic = heuristic
+        self.with_tree = with_tree
+        self.events = queue.Queue(self.MAX_BATCHES)
+        self.cancelled = threading.Event()
+
+    def run(self):
+        try:
+            batch = []
+            for event in search_events(self.frozen, self.source, self.target, self.heuristic, self.with_tree):
+                batch.append(event)
+                if len(batch) >= self.BATCH_SIZE:
+                    if not self._put(batch):
+                        return
+                    batch = []
+            self._put(batch)
+        except Exception as error:  # Report it to the reader instead of dying silently
+            self._put([(FAILED, f"{type(error).__name__}: {error}")])
+
+    def _put(self, batch):
+        # Wait for room, but give up once cancelled
+        while not self.cancelled.is_set():
+            try:
+                self.events.put(batch, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def next_batch(self):
+        # The next batch of events, or None if none is ready yet
+        try:
+            return self.events.get_nowait()
+        except queue.Empty:
+            return None
@@ -0,0 +1,97 @@
+# vectorized.py
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, only this engine needs it
+    np = None
+
+
+def solve_vectorized(frozen, source, target=-1, delta=None):
+    # Delta-stepping over a FrozenGraph with whole frontiers relaxed at once.
+    # Tentative distances are grouped in buckets of width delta; the lowest
+    # bucket is relaxed Bellman-Ford style (gather every outgoing edge of the
+    # nodes that changed, keep the smallest candidate per target) until it
+    # stops changing, after which its nodes are final. Returns numpy arrays
+    # (distances, previous) in the same form as solve_frozen: inf and -1 for
+    # nodes that were not reached. Distances match the reference solver; on
+    # ties previous may name a different but equally short predecessor.
+    if np is None:
+        raise ImportError("solve_vectorized needs numpy")
+
+    n = len(frozen)
+    offsets = np.frombuffer(frozen.offsets, dtype=np.int32).astype(np.int64)
+    targets = np.frombuffer(frozen.targets, dtype=np.int32)
+    weights = np.frombuffer(frozen.weights, dtype=np.float64)
+    if delta is None:
+        # Around one average edge per bucket keeps frontiers wide without
+        # too many repeated relaxations
+        delta = float(weights.mean()) if len(weights) else 1.0
+        delta = delta if delta > 0 else 1.0
+
+    distances = np.full(n, np.inf)
+    previous = np.full(n, -1, dtype=np.int32)
+    distances[source] = 0
+    # Reached but not yet settled nodes, and a mask of the same. Buckets
+    # only look at these, never at all n nodes, so a search that takes many
+    # buckets (a long road network with a narrow frontier) isn't dominated
+    # by passes over the whole graph.
+    frontier = np.array([source], dtype=np.int64)
+    in_frontier = np.zeros(n, dtype=bool)
+    in_frontier[source] = True
+
+    while len(frontier):
+        pending = distances[frontier]
+        bucket_end = (np.floor(pending.min() / delta) + 1) * delta
+        active = frontier[pending < bucket_end]
+        reached = [frontier]
+
+        while len(active):
+            changed = _relax(active, offsets, targets, weights, distances, previous)
+            new = changed[~in_frontier[changed]]
+            in_frontier[new] = True
+            reached.append(new)
+            active = changed[distances[changed] < bucket_end]
+
+        # Everything now below the bucket's end is final
+        frontier = np.concatenate(reached)
+        done = distances[frontier] < bucket_end
+        in_frontier[frontier[done]] = False
+        frontier = frontier[~done]
+        if target >= 0 and distances[target] < bucket_end:
+            break
+
+    return distances, previous
+
+
+def _relax(active, offsets, targets, weights, distances, previous):
+    # Relax all outgoing edges of the active nodes, return improved nodes
+    starts = offsets[active]
+    counts = offsets[active + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        return active[:0]
+    # Edge indices of every active node laid out back to back
+    shift = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    edges = shift + np.arange(total)
+    sources = np.repeat(active, counts)
+    candidates = distances[sources] + weights[edges]
+    destinations = targets[edges]
+
+    improving = candidates < distances[destinations]
+    if not improving.any():
+        return active[:0]
+    candidates = candidates[improving]
+    destinations = destinations[improving]
+    sources = sources[improving]
+
+    # Smallest candidate per destination: sort by (destination, candidate)
+    # and keep the first entry of each run
+    order = np.lexsort((candidates, destinations))
+    destinations = destinations[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = destinations[1:] != destinations[:-1]
+    winners = order[first]
+    changed = destinations[first]
+    distances[changed] = candidates[winners]
+    previous[changed] = sources[winners]
+    return changed